@@ -0,0 +1,14 @@
+"""
+Нагрузочные замеры маршрутов posts и users.
+
+Каждый маршрут прогоняется через тестовый клиент Django или через
+настоящий WSGI-сервер на наборах данных разного размера. Для маршрута
+считаются перцентили задержки, пропускная способность, число и время
+SQL-запросов и пиковый RSS. Результаты пишутся в JSON, который можно
+сравнить с прогоном на другом коммите:
+
+    python -m benchmarks run --size 1k --mode client
+    python -m benchmarks compare results/old.json results/new.json
+
+Конкуренцию процессов за SQLite замеряет python -m benchmarks contention.
+"""
@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_command(options):
+    from django.core.cache import cache
+
+    from . import dataset, routes, runner
+
+    selected = routes.select(options.route)
+    path, meta = dataset.prepare(options.size)
+    copy = dataset.working_copy(path)
+    # Прогон начинается с пустого кэша: и общего, и локального уровня.
+    cache.clear()
+    results = {
+        'meta': {
+            'commit': _commit(),
+            'size': options.size,
+            'posts': meta['size'],
+            'mode': options.mode,
+            'requests': options.requests,
+            'concurrency': options.concurrency,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'created': datetime.now(timezone.utc).isoformat(),
+        },
+        'routes': {},
+    }
+    try:
+        for route in selected:
+            metrics = runner.run_route(
+                route, meta,
+                mode=options.mode,
+                requests=options.requests,
+                concurrency=options.concurrency,
+                warmup=options.warmup,
+            )
+            results['routes'][route.name] = metrics
+            print(
+                f'{route.name:32} p50 {metrics["p50_ms"]:>9.2f} ms  '
+                f'p95 {metrics["p95_ms"]:>9.2f} ms  '
+                f'p99 {metrics["p99_ms"]:>9.2f} ms  '
+                f'{metrics["throughput_rps"]:>8.1f} rps  '
+                f'{metrics["queries_per_request"]:>5} SQL  '
+                f'{metrics["peak_rss_kb"] // 1024} MB'
+            )
+    finally:
+        dataset.remove(copy)
+    output = options.output or os.path.join(
+        RESULTS_DIR,
+        f'{results["meta"]["commit"]}-{options.size}-{options.mode}.json',
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as results_file:
+        json.dump(results, results_file, indent=2, ensure_ascii=False)
+    print(f'Результаты: {output}')
+
+
+def compare_command(options):
+    from . import compare
+
+    found = compare.report(
+        compare.load(options.old), compare.load(options.new),
+        options.threshold,
+    )
+    for line in found:
+        print(line)
+    if found:
+        sys.exit(1)
+    print('Регрессий нет.')
+
+
+def _print_contention(results, options):
+    for name, roles in results.items():
+        for role, metrics in roles.items():
+            print(
+                f'{name:6} {role:7} {metrics["ops_per_second"]:>9.1f} оп/с  '
+                f'p50 {metrics["p50_ms"]:>8.2f} ms  '
+                f'p95 {metrics["p95_ms"]:>8.2f} ms  '
+                f'locked {metrics["locked_errors"]}'
+            )
+    if options.output:
+        with open(options.output, 'w') as results_file:
+            json.dump(results, results_file, indent=2, ensure_ascii=False)
+        print(f'Результаты: {options.output}')
+
+
+def contention_command(options):
+    from . import contention
+
+    _print_contention(contention.run(
+        options.size, options.readers, options.writers, options.duration,
+    ), options)
+
+
+def batching_command(options):
+    from . import contention
+
+    _print_contention(contention.run_batching(
+        options.size, options.threads, options.duration,
+    ), options)
+
+
+def main():
+    django.setup()
+    from .dataset import SIZES
+    from .runner import CLIENT, WSGI
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='замерить маршруты')
+    run_parser.add_argument('--size', choices=SIZES, default='1k')
+    run_parser.add_argument('--mode', choices=(CLIENT, WSGI), default=CLIENT)
+    run_parser.add_argument('--requests', type=int, default=200)
+    run_parser.add_argument('--concurrency', type=int, default=1)
+    run_parser.add_argument('--warmup', type=int, default=10)
+    run_parser.add_argument(
+        '--route', action='append',
+        help='имя маршрута, например posts:index; по умолчанию все',
+    )
+    run_parser.add_argument('--output')
+    run_parser.set_defaults(handler=run_command)
+    compare_parser = commands.add_parser(
+        'compare', help='сравнить два файла результатов',
+    )
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument(
+        '--threshold', type=float, default=0.1,
+        help='допустимое ухудшение метрики, доля (по умолчанию 0.1)',
+    )
+    compare_parser.set_defaults(handler=compare_command)
+    contention_parser = commands.add_parser(
+        'contention',
+        help='конкуренция процессов за SQLite: штатный и настроенный бэкенд',
+    )
+    contention_parser.add_argument('--size', choices=SIZES, default='1k')
+    contention_parser.add_argument('--readers', type=int, default=4)
+    contention_parser.add_argument('--writers', type=int, default=2)
+    contention_parser.add_argument('--duration', type=float, default=5.0)
+    contention_parser.add_argument('--output')
+    contention_parser.set_defaults(handler=contention_command)
+    batching_parser = commands.add_parser(
+        'batching',
+        help='запись комментариев из потоков: напрямую и через очередь',
+    )
+    batching_parser.add_argument('--size', choices=SIZES, default='1k')
+    batching_parser.add_argument('--threads', type=int, default=64)
+    batching_parser.add_argument('--duration', type=float, default=5.0)
+    batching_parser.add_argument('--output')
+    batching_parser.set_defaults(handler=batching_command)
+    options = parser.parse_args()
+    options.handler(options)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Сравнение двух файлов результатов замеров."""
+import json
+
+# Метрика и направление: 1 — рост плохо, -1 — падение плохо.
+METRICS = {
+    'p50_ms': 1,
+    'p95_ms': 1,
+    'p99_ms': 1,
+    'throughput_rps': -1,
+    'queries_per_request': 1,
+    'peak_rss_kb': 1,
+}
+
+
+def load(path):
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def regressions(old, new, threshold):
+    """
+    Ухудшения метрик больше порога (доля) по общим маршрутам.
+    Число SQL-запросов — регрессия при любом росте.
+    """
+    found = []
+    for name, before in old['routes'].items():
+        after = new['routes'].get(name)
+        if after is None:
+            continue
+        for metric, direction in METRICS.items():
+            old_value, new_value = before.get(metric), after.get(metric)
+            if not old_value or new_value is None:
+                continue
+            change = (new_value - old_value) / old_value * direction
+            limit = 0 if metric == 'queries_per_request' else threshold
+            if change > limit:
+                found.append((name, metric, old_value, new_value, change))
+    return found
+
+
+def report(old, new, threshold):
+    lines = []
+    for name, metric, old_value, new_value, change in regressions(
+        old, new, threshold
+    ):
+        lines.append(
+            f'{name:32} {metric:20} {old_value:>12} -> {new_value:<12} '
+            f'({change:+.1%})'
+        )
+    return lines
@@ -0,0 +1,231 @@
+"""
+Конкуренция процессов за одну базу SQLite.
+
+Несколько процессов-читателей выбирают первую страницу главной ленты, а
+процессы-писатели добавляют комментарии (с пересчётом счётчиков, как
+add_comment) — каждый в своей транзакции. Прогон повторяется для
+штатного бэкенда Django и для core.backends.sqlite3 на свежей копии
+набора; для каждого считаются операции в секунду, задержки и ошибки
+«database is locked».
+
+Второй сценарий сравнивает запись комментариев из многих потоков одного
+процесса напрямую и через очередь групповой фиксации (WRITE_BATCHING).
+
+    python -m benchmarks contention --size 1k --readers 4 --writers 2
+    python -m benchmarks batching --size 1k --threads 64
+"""
+import multiprocessing
+import os
+import sqlite3
+import time
+
+ENGINES = {
+    'stock': 'django.db.backends.sqlite3',
+    'tuned': 'core.backends.sqlite3',
+}
+READER = 'reader'
+WRITER = 'writer'
+
+
+def _read():
+    from posts.models import Post
+
+    list(
+        Post.objects.select_related('author', 'group')
+        .order_by('-pub_date', '-id')[:10]
+    )
+
+
+def _write(meta):
+    from django.db import transaction
+
+    from posts.models import Comment
+
+    with transaction.atomic():
+        Comment.objects.create(
+            post_id=meta['post'], author_id=meta['reader'], text='нагрузка',
+        )
+
+
+def _comment(meta):
+    from core import write_queue
+    from posts.models import Comment
+    from posts.writes import create_comments
+
+    comment = Comment(
+        post_id=meta['post'], author_id=meta['reader'], text='нагрузка',
+    )
+    write_queue.submit_many(create_comments, comment)
+
+
+def _worker(role, meta, duration, barrier, results):
+    """
+    Процесс нагрузки. Модуль импортируется в нём до настройки Django,
+    поэтому модели и общие модули проекта импортируются внутри функций.
+    """
+    import django
+
+    django.setup()
+    from django.db import OperationalError, connection
+
+    connection.ensure_connection()
+    operation = _read if role == READER else lambda: _write(meta)
+    latencies = []
+    errors = 0
+    barrier.wait()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            operation()
+        except OperationalError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+    results.put((role, latencies, errors))
+
+
+def summarize(samples, duration):
+    """Сводка по ролям: операции в секунду, p50/p95 и ошибки."""
+    from .runner import percentile
+
+    summary = {}
+    for role in (READER, WRITER):
+        latencies = [
+            latency
+            for sample_role, sample, _ in samples if sample_role == role
+            for latency in sample
+        ]
+        summary[role] = {
+            'ops_per_second': round(len(latencies) / duration, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'locked_errors': sum(
+                errors for sample_role, _, errors in samples
+                if sample_role == role
+            ),
+        }
+    return summary
+
+
+def _remove(copy):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(copy + suffix):
+            os.remove(copy + suffix)
+
+
+def _fresh_copy(path, engine):
+    copy = path[:-len('.sqlite3')] + f'-{engine}.sqlite3'
+    _remove(copy)
+    source = sqlite3.connect(path)
+    target = sqlite3.connect(copy)
+    try:
+        source.backup(target)
+        # Режим WAL хранится в файле: штатный бэкенд должен начать с
+        # журнала отката, как база без настройки.
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        source.close()
+        target.close()
+    return copy
+
+
+def run(size='1k', readers=4, writers=2, duration=5.0):
+    """Прогон для каждого бэкенда; возвращает сводки по именам."""
+    from . import dataset
+
+    path, meta = dataset.prepare(size)
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    environ = dict(os.environ)
+    for name, engine in ENGINES.items():
+        copy = _fresh_copy(path, name)
+        os.environ['YATUBE_DB_ENGINE'] = engine
+        os.environ['BENCHMARK_DATABASE'] = copy
+        barrier = context.Barrier(readers + writers)
+        queue = context.Queue()
+        roles = [READER] * readers + [WRITER] * writers
+        processes = [
+            context.Process(
+                target=_worker,
+                args=(role, meta, duration, barrier, queue),
+            )
+            for role in roles
+        ]
+        for process in processes:
+            process.start()
+        samples = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        results[name] = summarize(samples, duration)
+        _remove(copy)
+    os.environ.clear()
+    os.environ.update(environ)
+    return results
+
+
+def _threads_worker(meta, threads, duration, results):
+    """Процесс с потоками-писателями, как у многопоточного WSGI-сервера."""
+    import threading
+
+    import django
+
+    django.setup()
+    from django.db import OperationalError, connection
+
+    barrier = threading.Barrier(threads)
+    samples = []
+
+    def write():
+        connection.ensure_connection()
+        latencies = []
+        errors = 0
+        barrier.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                _comment(meta)
+            except OperationalError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+        connection.close()
+        samples.append((WRITER, latencies, errors))
+
+    pool = [threading.Thread(target=write) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    from core import write_queue
+
+    write_queue.shutdown()
+    results.put(samples)
+
+
+def run_batching(size='1k', threads=64, duration=5.0):
+    """Запись комментариев напрямую и через очередь групповой фиксации."""
+    from . import dataset
+
+    path, meta = dataset.prepare(size)
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    environ = dict(os.environ)
+    for name, batching in (('direct', ''), ('batched', '1')):
+        copy = _fresh_copy(path, name)
+        os.environ['YATUBE_WRITE_BATCHING'] = batching
+        os.environ['BENCHMARK_DATABASE'] = copy
+        queue = context.Queue()
+        process = context.Process(
+            target=_threads_worker, args=(meta, threads, duration, queue),
+        )
+        process.start()
+        samples = queue.get()
+        process.join()
+        results[name] = {WRITER: summarize(samples, duration)[WRITER]}
+        _remove(copy)
+    os.environ.clear()
+    os.environ.update(environ)
+    return results
@@ -0,0 +1,99 @@
+"""
+Наборы данных для замеров.
+
+Набор генерируется командой seed_yatube один раз в
+benchmarks/data/<size>-v<VERSION>.sqlite3 с фиксированным зерном
+генератора, поэтому прогоны на разных коммитах идут по одинаковым
+данным. Рядом лежит .json с объектами, на которых строятся адреса
+маршрутов.
+Прогон работает с копией файла: пишущие маршруты не меняют исходный
+набор.
+"""
+import json
+import os
+import shutil
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+
+from posts.models import Group, UserStats
+
+SIZES = {
+    '1k': 1_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+SEED = 2022
+# Доля постов с картинкой; миниатюры строятся вместе с набором.
+IMAGES = 0.2
+# Меняется вместе с составом набора, чтобы не брать старый из data/.
+VERSION = 2
+
+
+def database_path(size):
+    return os.path.join(DATA_DIR, f'{size}-v{VERSION}.sqlite3')
+
+
+def seed(posts_total):
+    """Заполняет пустую БД; возвращает объекты для адресов маршрутов."""
+    call_command(
+        'seed_yatube', posts=posts_total, images=IMAGES, seed=SEED,
+        stdout=StringIO(),
+    )
+    author = UserStats.objects.order_by('-posts_count').first().user
+    reader = UserStats.objects.order_by('-following_count').first().user
+    group = Group.objects.order_by('-posts_count').first()
+    post = author.posts.order_by('-pub_date').first()
+    return {
+        'size': posts_total,
+        'reader': reader.pk,
+        'author': author.pk,
+        'author_username': author.username,
+        'group_slug': group.slug,
+        'group': group.pk,
+        'post': post.pk,
+        'query': post.text.split()[0],
+    }
+
+
+def prepare(size):
+    """Путь к готовому набору и объекты для адресов; создаёт набор."""
+    path = database_path(size)
+    meta_path = path[:-len('.sqlite3')] + '.json'
+    if not os.path.exists(meta_path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        remove(path)
+        _use_database(path)
+        call_command('migrate', verbosity=0)
+        meta = seed(SIZES[size])
+        connections['default'].close()
+        with open(meta_path, 'w') as meta_file:
+            json.dump(meta, meta_file)
+    with open(meta_path) as meta_file:
+        return path, json.load(meta_file)
+
+
+def working_copy(path):
+    """Копия набора для одного прогона."""
+    copy = path[:-len('.sqlite3')] + '-run.sqlite3'
+    # Журнал WAL прошлого прогона иначе применился бы к новой копии.
+    remove(copy)
+    shutil.copyfile(path, copy)
+    _use_database(copy)
+    return copy
+
+
+def remove(path):
+    """Удаляет файл БД вместе с журналом WAL и индексом общей памяти."""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _use_database(path):
+    connections['default'].close()
+    settings.DATABASES['default']['NAME'] = path
+    connections['default'].settings_dict['NAME'] = path
@@ -0,0 +1,75 @@
+"""Маршруты posts и users, которые прогоняются замерами."""
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from urllib.parse import urlencode
+
+from django.urls import reverse
+
+
+@dataclass
+class Route:
+    name: str
+    path: Callable[[dict], str]
+    method: str = 'GET'
+    # Кем выполнять запрос: None (аноним), 'reader' или 'author'.
+    login: Optional[str] = None
+    data: Callable[[dict], dict] = field(default=lambda meta: {})
+
+
+def _url(name, *args):
+    return lambda meta: reverse(name, args=[meta[arg] for arg in args])
+
+
+ROUTES = [
+    Route('posts:index', _url('posts:index')),
+    Route('posts:group', _url('posts:group', 'group_slug')),
+    Route('posts:profile', _url('posts:profile', 'author_username')),
+    Route('posts:post_detail', _url('posts:post_detail', 'post')),
+    Route('posts:follow_index', _url('posts:follow_index'), login='reader'),
+    Route(
+        'posts:search',
+        lambda meta: (
+            reverse('posts:search') + '?' + urlencode({'q': meta['query']})
+        ),
+    ),
+    Route('posts:post_edit', _url('posts:post_edit', 'post'), login='author'),
+    Route(
+        'posts:add_comment',
+        _url('posts:add_comment', 'post'),
+        method='POST',
+        login='reader',
+        data=lambda meta: {'text': 'Комментарий из замера'},
+    ),
+    Route(
+        'posts:post_create',
+        _url('posts:post_create'),
+        method='POST',
+        login='author',
+        data=lambda meta: {'text': 'Пост из замера', 'group': meta['group']},
+    ),
+    Route(
+        'posts:profile_follow',
+        _url('posts:profile_follow', 'author_username'),
+        login='reader',
+    ),
+    Route(
+        'posts:profile_unfollow',
+        _url('posts:profile_unfollow', 'author_username'),
+        login='reader',
+    ),
+    Route('users:signup', _url('users:signup')),
+    Route('users:login', _url('users:login')),
+    Route('users:password_reset_form', _url('users:password_reset_form')),
+    Route('users:logout', _url('users:logout')),
+]
+
+
+def select(names):
+    """Маршруты по именам; пустой список — все маршруты."""
+    if not names:
+        return ROUTES
+    known = {route.name: route for route in ROUTES}
+    unknown = set(names) - set(known)
+    if unknown:
+        raise ValueError(f'Неизвестные маршруты: {", ".join(sorted(unknown))}')
+    return [known[name] for name in names]
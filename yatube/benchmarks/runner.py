@@ -0,0 +1,270 @@
+"""
+Прогон маршрутов и сбор метрик.
+
+Каждый маршрут замеряется в отдельном дочернем процессе (fork), чтобы
+пиковый RSS относился к одному маршруту, а не ко всему прогону. Запросы
+идут либо через тестовый клиент Django, либо по HTTP в многопоточный
+WSGI-сервер из стандартной библиотеки, запущенный в том же процессе:
+SQL-запросы в обоих режимах считаются обёрткой execute_wrapper на всех
+соединениях.
+"""
+import multiprocessing
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from http.cookies import SimpleCookie
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+User = get_user_model()
+
+CLIENT = 'client'
+WSGI = 'wsgi'
+
+
+class QueryCounter:
+    """Считает SQL-запросы и их время на всех соединениях процесса."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.count += 1
+                self.seconds += elapsed
+
+    def install(self):
+        for connection in connections.all():
+            connection.execute_wrappers.append(self)
+        connection_created.connect(self._connection_created, weak=False)
+
+    def uninstall(self):
+        connection_created.disconnect(self._connection_created)
+        for connection in connections.all():
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+    def _connection_created(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.seconds = 0.0
+
+
+def percentile(values, fraction):
+    """Перцентиль методом ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies, elapsed, errors, queries):
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+        'queries_per_request': round(queries.count / count, 2)
+        if count else 0.0,
+        'sql_ms_per_request': round(queries.seconds / count * 1000, 3)
+        if count else 0.0,
+    }
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class ClientSession:
+    """Запросы через тестовый клиент Django."""
+
+    def __init__(self, user):
+        self.client = Client()
+        if user is not None:
+            self.client.force_login(user)
+
+    def request(self, method, path, data):
+        # Тестовый клиент пробрасывает исключения view вместо ответа 500.
+        try:
+            response = self.client.generic(
+                method,
+                path,
+                urlencode(data),
+                content_type='application/x-www-form-urlencoded',
+            )
+        except Exception:
+            return 500
+        return response.status_code
+
+
+class HttpSession:
+    """Запросы по HTTP в WSGI-сервер с сессией и CSRF-токеном."""
+
+    def __init__(self, address, user):
+        self.address = address
+        self.cookies = {}
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            self.cookies[settings.SESSION_COOKIE_NAME] = (
+                client.cookies[settings.SESSION_COOKIE_NAME].value
+            )
+        # Страница входа выставляет CSRF-cookie для пишущих запросов.
+        self.request('GET', '/auth/login/', {})
+
+    def request(self, method, path, data):
+        connection = HTTPConnection(*self.address)
+        headers = {
+            'Cookie': '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()
+            ),
+        }
+        body = None
+        if method == 'POST':
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies.get(
+                settings.CSRF_COOKIE_NAME, ''
+            )
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            for header in response.headers.get_all('Set-Cookie') or []:
+                for name, morsel in SimpleCookie(header).items():
+                    self.cookies[name] = morsel.value
+            return response.status
+        finally:
+            connection.close()
+
+
+def _repeat(function, count, concurrency):
+    if concurrency == 1:
+        return [function(index) for index in range(count)]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(function, range(count)))
+
+
+def _users(meta):
+    return {
+        'reader': User.objects.get(pk=meta['reader']),
+        'author': User.objects.get(pk=meta['author']),
+    }
+
+
+def measure(route, meta, mode, requests, concurrency, warmup):
+    """Метрики одного маршрута; выполняется в дочернем процессе."""
+    queries = QueryCounter()
+    queries.install()
+    user = _users(meta)[route.login] if route.login else None
+    server = None
+    if mode == WSGI:
+        server = make_server(
+            '127.0.0.1', 0, get_wsgi_application(),
+            server_class=_ThreadingWSGIServer, handler_class=_QuietHandler,
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = (
+                HttpSession(server.server_address, user)
+                if server else ClientSession(user)
+            )
+        return local.session
+
+    path = route.path(meta)
+    data = route.data(meta)
+
+    def one(_):
+        current = session()
+        start = time.perf_counter()
+        status = current.request(route.method, path, data)
+        return time.perf_counter() - start, status
+
+    try:
+        _repeat(one, warmup, concurrency)
+        queries.reset()
+        start = time.perf_counter()
+        results = _repeat(one, requests, concurrency)
+        elapsed = time.perf_counter() - start
+    finally:
+        queries.uninstall()
+        if server:
+            server.shutdown()
+            server.server_close()
+    summary = summarize(
+        [latency for latency, _ in results],
+        elapsed,
+        sum(1 for _, status in results if status >= 500),
+        queries,
+    )
+    summary.update({
+        'method': route.method,
+        'path': path,
+        'statuses': sorted({status for _, status in results}),
+        # ru_maxrss в Linux измеряется в килобайтах.
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    })
+    return summary
+
+
+def _child(pipe, *args):
+    try:
+        pipe.send(('ok', measure(*args)))
+    except Exception as error:
+        pipe.send(('error', repr(error)))
+    finally:
+        connections.close_all()
+        pipe.close()
+
+
+def run_route(route, meta, mode=CLIENT, requests=200, concurrency=1,
+              warmup=10):
+    """Замеряет маршрут в отдельном процессе и возвращает метрики."""
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+    connections.close_all()
+    process = context.Process(
+        target=_child,
+        args=(sender, route, meta, mode, requests, concurrency, warmup),
+    )
+    process.start()
+    sender.close()
+    status, payload = receiver.recv()
+    process.join()
+    if status == 'error':
+        raise RuntimeError(f'{route.name}: {payload}')
+    return payload
@@ -0,0 +1,40 @@
+"""Настройки проекта для замеров: боевые, но с отдельной БД и кэшем."""
+import os
+import tempfile
+
+from yatube.settings_production import *  # noqa: F401,F403
+from yatube.settings_production import (
+    CACHES, DATABASES, SHARED_CACHE_BACKENDS,
+)
+
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'NAME': os.getenv('BENCHMARK_DATABASE', ':memory:'),
+    }
+}
+
+# Общий кэш — отдельный каталог, который очищается перед каждым прогоном:
+# записи прошлых прогонов и других коммитов не должны попадать в замеры.
+CACHES = {
+    **CACHES,
+    'shared': {
+        **CACHES['shared'],
+        'BACKEND': SHARED_CACHE_BACKENDS['file'],
+        'LOCATION': os.getenv(
+            'BENCHMARK_CACHE_DIR',
+            os.path.join(tempfile.gettempdir(), 'yatube-benchmark-cache'),
+        ),
+    },
+}
+
+MEDIA_ROOT = os.path.join(tempfile.gettempdir(), 'yatube-benchmark-media')
+# Миниатюры строит seed_yatube при создании набора, страницы только ищут
+# готовые, как в бою; пул процессов в замерах не нужен.
+THUMBNAIL_PREGENERATE = 'sync'
+IMAGE_REENCODE = 'inline'
+SLOW_QUERY_LOG = os.path.join(
+    tempfile.gettempdir(), 'yatube-benchmark-slow-queries.log'
+)
+# Журнал медленных запросов не пишется: запись файла искажает замеры.
+SLOW_QUERY_MS = None
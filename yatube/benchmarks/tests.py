@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from posts.models import Group, Post
+
+from . import compare, contention, routes, runner
+
+User = get_user_model()
+
+
+class PercentileTest(TestCase):
+    def test_nearest_rank(self):
+        """Перцентиль считается методом ближайшего ранга"""
+        values = list(range(1, 101))
+        self.assertEqual(runner.percentile(values, 0.50), 50)
+        self.assertEqual(runner.percentile(values, 0.95), 95)
+        self.assertEqual(runner.percentile(values, 0.99), 99)
+        self.assertEqual(runner.percentile([], 0.99), 0.0)
+
+
+class CompareTest(TestCase):
+    def results(self, **metrics):
+        return {'routes': {'posts:index': metrics}}
+
+    def test_slower_route_is_regression(self):
+        """Рост p95 больше порога и падение пропускной способности"""
+        found = compare.regressions(
+            self.results(p95_ms=10, throughput_rps=100),
+            self.results(p95_ms=12, throughput_rps=80),
+            threshold=0.1,
+        )
+        self.assertEqual(
+            [metric for _, metric, *_ in found],
+            ['p95_ms', 'throughput_rps'],
+        )
+
+    def test_any_extra_query_is_regression(self):
+        """Любой рост числа SQL-запросов считается регрессией"""
+        found = compare.regressions(
+            self.results(queries_per_request=4, p95_ms=10),
+            self.results(queries_per_request=5, p95_ms=10.5),
+            threshold=0.5,
+        )
+        self.assertEqual(found[0][1], 'queries_per_request')
+        self.assertEqual(len(found), 1)
+
+
+class ContentionSummaryTest(TestCase):
+    def test_summary_by_role(self):
+        """Сводка считает операции, перцентили и блокировки по ролям"""
+        summary = contention.summarize([
+            (contention.READER, [0.001] * 10, 0),
+            (contention.READER, [0.003] * 10, 1),
+            (contention.WRITER, [0.010] * 4, 2),
+        ], duration=2)
+        self.assertEqual(summary['reader']['ops_per_second'], 10)
+        self.assertEqual(summary['reader']['p95_ms'], 3)
+        self.assertEqual(summary['reader']['locked_errors'], 1)
+        self.assertEqual(summary['writer']['ops_per_second'], 2)
+        self.assertEqual(summary['writer']['locked_errors'], 2)
+
+
+class MeasureTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='group', slug='group', description='description',
+        )
+        cls.post = Post.objects.create(
+            text='пост', author=cls.author, group=cls.group,
+        )
+        cls.meta = {
+            'size': 1,
+            'reader': cls.reader.pk,
+            'author': cls.author.pk,
+            'author_username': cls.author.username,
+            'group_slug': cls.group.slug,
+            'group': cls.group.pk,
+            'post': cls.post.pk,
+            'query': 'пост',
+        }
+
+    def test_every_route_is_measured(self):
+        """Каждый маршрут отвечает без ошибок и даёт полный набор метрик"""
+        for route in routes.ROUTES:
+            with self.subTest(route=route.name):
+                metrics = runner.measure(
+                    route, self.meta, runner.CLIENT,
+                    requests=3, concurrency=1, warmup=1,
+                )
+                self.assertEqual(metrics['requests'], 3)
+                self.assertEqual(metrics['errors'], 0, metrics['statuses'])
+                for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps',
+                            'queries_per_request', 'peak_rss_kb'):
+                    self.assertIn(key, metrics)
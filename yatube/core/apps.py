@@ -1,5 +1,33 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_out
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import auth, checks, db, slow_queries  # noqa: F401
+
+        connection_created.connect(
+            slow_queries.install, dispatch_uid='core.slow_queries'
+        )
+        request_started.connect(
+            db.check_connections, dispatch_uid='core.check_connections'
+        )
+        post_save.connect(
+            auth.user_changed,
+            sender=settings.AUTH_USER_MODEL,
+            dispatch_uid='core.auth.user_saved',
+        )
+        post_delete.connect(
+            auth.user_changed,
+            sender=settings.AUTH_USER_MODEL,
+            dispatch_uid='core.auth.user_deleted',
+        )
+        user_logged_out.connect(
+            auth.user_logged_out, dispatch_uid='core.auth.user_logged_out'
+        )
@@ -0,0 +1,89 @@
+"""
+Пользователь запроса из общего кэша.
+
+AuthenticationMiddleware на каждый запрос загружает пользователя сессии из
+auth_user. CachedModelBackend держит в общем кэше (без локального уровня
+процесса, иначе выход и смена пароля доходили бы до других воркеров с
+опозданием) снимок полей для шапки и прав вместе с хешем сессии и собирает
+из него модель без запросов к БД. Пароль в снимок не попадает; остальные
+поля догружаются из БД при обращении. Снимок удаляется при любом
+сохранении или удалении пользователя (смена пароля, правка профиля,
+отметка о входе) и при выходе.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+CACHE_ALIAS = 'shared'
+KEY_PREFIX = 'auth-user'
+SNAPSHOT_FIELDS = (
+    'id', 'username', 'first_name', 'last_name',
+    'is_active', 'is_staff', 'is_superuser',
+)
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _key(user_id):
+    return f'{KEY_PREFIX}:{user_id}'
+
+
+def snapshot(user):
+    # from_db ждёт значения в порядке полей модели.
+    return {
+        'fields': {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields
+            if field.attname in SNAPSHOT_FIELDS
+        },
+        'session_auth_hash': user.get_session_auth_hash(),
+    }
+
+
+def _from_snapshot(values):
+    fields = values['fields']
+    user = get_user_model().from_db(
+        DEFAULT_DB_ALIAS, list(fields), list(fields.values())
+    )
+    stored_hash = values['session_auth_hash']
+
+    def get_session_auth_hash():
+        # Пароль загружен или сменён: хеш считается от него.
+        if 'password' in user.__dict__:
+            return type(user).get_session_auth_hash(user)
+        return stored_hash
+
+    user.get_session_auth_hash = get_session_auth_hash
+    return user
+
+
+def invalidate(user_id):
+    _cache().delete(_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        values = _cache().get(_key(user_id))
+        if values is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                _cache().set(
+                    _key(user_id), snapshot(user), settings.USER_CACHE_SECONDS
+                )
+            return user
+        user = _from_snapshot(values)
+        return user if self.user_can_authenticate(user) else None
+
+
+def user_changed(sender, instance, **kwargs):
+    """Обработчик post_save и post_delete пользователя."""
+    invalidate(instance.pk)
+
+
+def user_logged_out(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate(user.pk)
@@ -0,0 +1,41 @@
+"""
+SQLite с настройками для нескольких процессов-воркеров.
+
+Каждое соединение включает WAL (читатели не ждут писателя), synchronous
+NORMAL (в WAL данные не теряются при падении процесса, fsync только на
+контрольной точке), mmap, увеличенный кэш страниц, временные таблицы в
+памяти и busy_timeout. Транзакции начинаются с BEGIN IMMEDIATE: писатель
+берёт блокировку сразу и ждёт её по busy_timeout, а не получает
+«database is locked» при повышении блокировки посреди транзакции.
+
+Прагмы меняются ключом PRAGMAS настроек базы, режим транзакций —
+ключом TRANSACTION_MODE (DEFERRED, IMMEDIATE или EXCLUSIVE).
+"""
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -20_000,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def pragmas(self):
+        return {**DEFAULT_PRAGMAS, **self.settings_dict.get('PRAGMAS', {})}
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas().items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict.get('TRANSACTION_MODE', 'IMMEDIATE')
+        if mode not in TRANSACTION_MODES:
+            mode = 'DEFERRED'
+        self.cursor().execute(f'BEGIN {mode}')
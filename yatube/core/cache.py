@@ -0,0 +1,173 @@
+"""
+Двухуровневый кэш: небольшой LRU в памяти процесса перед общим кэшем.
+
+Общий уровень (файлы, БД, memcached) виден всем процессам, поэтому
+инвалидация в одном воркере видна остальным. Локальный уровень снимает
+сетевые и дисковые обращения к горячим ключам; его записи живут не
+дольше LOCAL_TIMEOUT секунд, так что чужие изменения видны с задержкой
+не больше этого времени. Записи, сделанные самим процессом, видны сразу.
+
+Поэтому через него идут только записи, которые не меняются под своим
+ключом: фрагменты шаблонов и карточки постов с версией в ключе. Версии
+содержимого, страницы, сущности, сессии и пользователи читаются прямо из
+общего кэша.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+stats = Counter()
+
+
+def cache_stats():
+    """Счётчики попаданий и промахов по уровням с момента старта процесса."""
+    lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+    return {
+        **stats,
+        'lookups': lookups,
+        'hit_ratio': (
+            (stats['local_hits'] + stats['shared_hits']) / lookups
+            if lookups else 0.0
+        ),
+    }
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = location
+        self.local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self.local_timeout = float(options.get('LOCAL_TIMEOUT', 5))
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _local_key(self, key, version):
+        return self.make_key(key, version=version)
+
+    def _local_get(self, local_key):
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._local[local_key]
+                return None
+            self._local.move_to_end(local_key)
+            return entry
+
+    def _local_set(self, local_key, value, timeout=DEFAULT_TIMEOUT):
+        if not self.local_max_entries:
+            return
+        lifetime = self.local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            if timeout <= 0:
+                self._local_delete(local_key)
+                return
+            lifetime = min(lifetime, timeout)
+        with self._lock:
+            self._local[local_key] = (time.monotonic() + lifetime, value)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+                stats['local_evictions'] += 1
+
+    def _local_delete(self, local_key):
+        with self._lock:
+            self._local.pop(local_key, None)
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        entry = self._local_get(local_key)
+        if entry is not None:
+            stats['local_hits'] += 1
+            metrics.record_cache(hits=1)
+            return entry[1]
+        sentinel = object()
+        value = self.shared.get(key, sentinel, version=version)
+        if value is sentinel:
+            stats['misses'] += 1
+            metrics.record_cache(misses=1)
+            return default
+        stats['shared_hits'] += 1
+        metrics.record_cache(hits=1)
+        self._local_set(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        for key in keys:
+            entry = self._local_get(self._local_key(key, version))
+            if entry is None:
+                remote.append(key)
+            else:
+                found[key] = entry[1]
+        fetched = (
+            self.shared.get_many(remote, version=version) if remote else {}
+        )
+        for key, value in fetched.items():
+            self._local_set(self._local_key(key, version), value)
+        stats['local_hits'] += len(found)
+        stats['shared_hits'] += len(fetched)
+        stats['misses'] += len(remote) - len(fetched)
+        metrics.record_cache(
+            hits=len(found) + len(fetched),
+            misses=len(remote) - len(fetched),
+        )
+        found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._local_set(self._local_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(self._local_key(key, version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._local_set(self._local_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_delete(self._local_key(key, version))
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        if self._local_get(self._local_key(key, version)) is not None:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
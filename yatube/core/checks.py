@@ -0,0 +1,134 @@
+"""
+Проверки настроек, которые замедляют или ломают боевой сервер.
+
+Проверки производительности запускаются командами perf_check и
+check --deploy, проверка кэша сессий — check --deploy.
+"""
+from django.conf import settings
+from django.core import checks
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.cached import Loader as CachedLoader
+
+from . import auth
+
+
+def _templates():
+    issues = []
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        loaders = engine.engine.template_loaders
+        if not all(isinstance(loader, CachedLoader) for loader in loaders):
+            issues.append(checks.Warning(
+                f'Шаблоны движка {engine.name} компилируются при каждом '
+                'рендеринге.',
+                hint='Используйте django.template.loaders.cached.Loader.',
+                id='yatube.W003',
+            ))
+        if engine.engine.debug:
+            issues.append(checks.Warning(
+                f'У движка шаблонов {engine.name} включена отладка.',
+                hint="Уберите OPTIONS['debug'] или выключите DEBUG.",
+                id='yatube.W004',
+            ))
+    return issues
+
+
+def _databases():
+    issues = []
+    for alias, database in settings.DATABASES.items():
+        if not database.get('CONN_MAX_AGE'):
+            issues.append(checks.Warning(
+                f'База {alias} открывает новое соединение на каждый запрос.',
+                hint='Задайте CONN_MAX_AGE (YATUBE_CONN_MAX_AGE).',
+                id='yatube.W005',
+            ))
+        if database['ENGINE'] == 'django.db.backends.sqlite3':
+            issues.append(checks.Warning(
+                f'База {alias} работает на SQLite без WAL и busy_timeout: '
+                'воркеры блокируют друг друга.',
+                hint="ENGINE = 'core.backends.sqlite3'.",
+                id='yatube.W010',
+            ))
+    return issues
+
+
+def performance_issues():
+    """Список предупреждений о настройках, вредных для скорости."""
+    issues = []
+    if settings.DEBUG:
+        issues.append(checks.Warning(
+            'DEBUG включён: Django хранит все SQL-запросы запроса.',
+            hint='YATUBE_ENV=production или YATUBE_DEBUG=0.',
+            id='yatube.W001',
+        ))
+    if ('debug_toolbar' in settings.INSTALLED_APPS
+            or any(middleware.startswith('debug_toolbar')
+                   for middleware in settings.MIDDLEWARE)):
+        issues.append(checks.Warning(
+            'Подключён debug_toolbar.',
+            id='yatube.W002',
+        ))
+    issues.extend(_templates())
+    issues.extend(_databases())
+    if settings.SLOW_QUERY_MS == 0:
+        issues.append(checks.Warning(
+            'Журнал медленных запросов пишет каждый запрос.',
+            hint='Поднимите SLOW_QUERY_MS (YATUBE_SLOW_QUERY_MS).',
+            id='yatube.W006',
+        ))
+    if 0 < settings.PROFILE_SAMPLE_RATE < 100:
+        issues.append(checks.Warning(
+            f'Профилируется каждый {settings.PROFILE_SAMPLE_RATE}-й запрос.',
+            hint='Поднимите PROFILE_SAMPLE_RATE или выключите выборку (0).',
+            id='yatube.W007',
+        ))
+    if settings.THUMBNAIL_PREGENERATE != 'async':
+        issues.append(checks.Warning(
+            'Миниатюры строятся в потоке запроса.',
+            hint='YATUBE_THUMBNAIL_PREGENERATE=async.',
+            id='yatube.W008',
+        ))
+    if settings.IMAGE_REENCODE == 'inline':
+        issues.append(checks.Warning(
+            'Загруженные картинки перекодируются в потоке запроса.',
+            hint='YATUBE_IMAGE_REENCODE=pool.',
+            id='yatube.W009',
+        ))
+    if not settings.PAGE_CACHE_SECONDS:
+        issues.append(checks.Warning(
+            'Страницы для анонимных посетителей рендерятся на каждый запрос.',
+            hint='YATUBE_PAGE_CACHE_SECONDS=60.',
+            id='yatube.W011',
+        ))
+    return issues
+
+
+@checks.register('performance', deploy=True)
+def check_performance(app_configs, **kwargs):
+    return performance_issues()
+
+
+LOCMEM_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_session_cache(app_configs, **kwargs):
+    """Сессии и снимки пользователей не должны жить в кэше процесса."""
+    aliases = set()
+    if settings.SESSION_ENGINE == 'core.sessions':
+        aliases.add(settings.SESSION_CACHE_ALIAS)
+    if 'core.auth.CachedModelBackend' in settings.AUTHENTICATION_BACKENDS:
+        aliases.add(auth.CACHE_ALIAS)
+    return [
+        checks.Error(
+            f'Сессии и пользователи хранятся в кэше {alias} на locmem: '
+            'у каждого воркера свой, выход и смена пароля не доходят до '
+            'остальных.',
+            hint='YATUBE_CACHE_BACKEND=file, db или memcached.',
+            id='yatube.E001',
+        )
+        for alias in sorted(aliases)
+        if settings.CACHES.get(alias, {}).get('BACKEND') == LOCMEM_BACKEND
+    ]
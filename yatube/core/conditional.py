@@ -0,0 +1,81 @@
+"""
+Условные GET-запросы для страниц с версией содержимого.
+
+Версия страницы (см. posts.cache_versions) — время последнего изменения
+её областей в наносекундах, она известна без рендеринга. Из неё и
+пользователя строится ETag, из самой поздней области — Last-Modified;
+на совпавшие If-None-Match / If-Modified-Since отдаётся 304 без вызова
+view. ETag слабый: кэш страниц отдаёт одну версию и сжатой gzip, и
+несжатой, байты у них разные (ответ всегда несёт Vary: Accept-Encoding).
+Для вошедших пользователей в ETag входят ещё сессия и CSRF-токен,
+а Last-Modified не отдаётся: по дате не отличить страницу из прошлой
+сессии.
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+
+def content_version(request, get_version, args, kwargs):
+    """Версия страницы, вычисленная один раз на запрос."""
+    versions = request.__dict__.setdefault('_content_versions', {})
+    if get_version not in versions:
+        versions[get_version] = get_version(request, *args, **kwargs)
+    return versions[get_version]
+
+
+def _etag(*parts):
+    digest = hashlib.md5(':'.join(parts).encode()).hexdigest()
+    return f'W/{quote_etag(digest)}'
+
+
+def _validators(request, version):
+    if request.user.is_authenticated:
+        # Страница зависит от пользователя: шапка, кнопки подписки, формы.
+        # CSRF-токен в формах меняется при каждом входе вместе с сессией:
+        # страница из прошлой сессии не прошла бы проверку при отправке.
+        etag = _etag(
+            str(request.user.pk),
+            request.session.session_key or '',
+            request.META.get('CSRF_COOKIE', ''),
+            version,
+        )
+        return etag, None
+    last_modified = max(int(part) for part in version.split('.')) // 10**9
+    return _etag('0', version), last_modified
+
+
+def conditional_page(get_version):
+    """
+    Отвечает 304 Not Modified, если у клиента актуальная версия страницы.
+
+    get_version(request, *args, **kwargs) — как у page_cache.anonymous_page.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            version = content_version(request, get_version, args, kwargs)
+            etag, last_modified = _validators(request, version)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified,
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    response['ETag'] = etag
+                    if last_modified is not None:
+                        response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ('Accept-Encoding',))
+            if request.user.is_authenticated:
+                patch_cache_control(response, no_cache=True, private=True)
+            else:
+                patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,4 @@
+def public_page(request):
+    return {
+        'public_page': getattr(request, 'public_page', False)
+    }
@@ -0,0 +1,18 @@
+from django.db import connections
+
+
+def check_connections(**kwargs):
+    """
+    Закрывает мёртвые постоянные соединения перед запросом.
+
+    Обработчик request_started для баз с CONN_HEALTH_CHECKS: соединение,
+    пережившее прошлый запрос (CONN_MAX_AGE), проверяется, и вместо
+    оборванного Django откроет новое, а не вернёт ошибку пользователю.
+    """
+    for connection in connections.all():
+        if (not connection.settings_dict.get('CONN_HEALTH_CHECKS')
+                or connection.connection is None
+                or connection.in_atomic_block):
+            continue
+        if not connection.is_usable():
+            connection.close()
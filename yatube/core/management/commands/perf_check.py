@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.checks import performance_issues
+
+
+class Command(BaseCommand):
+    help = 'Сообщает о настройках, которые замедляют боевой сервер.'
+
+    def handle(self, *args, **options):
+        issues = performance_issues()
+        for issue in issues:
+            self.stdout.write(f'{issue.id}: {issue.msg}')
+            if issue.hint:
+                self.stdout.write(f'    {issue.hint}')
+        if issues:
+            raise CommandError(f'Вредных для скорости настроек: {len(issues)}')
+        self.stdout.write('Настройки производительности в порядке.')
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводит сохранённые профили запросов в список самых горячих '
+        'функций по каждому view.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'views', nargs='*',
+            help='Имена view, например posts:profile; по умолчанию все.',
+        )
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument(
+            '--sort', choices=('tottime', 'cumtime'), default='tottime',
+        )
+        parser.add_argument(
+            '--token', action='store_true',
+            help='Напечатать значение заголовка X-Yatube-Profile.',
+        )
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(profiling.make_token())
+            return
+        views = options['views'] or profiling.stored_views()
+        if not views:
+            raise CommandError('Сохранённых профилей нет.')
+        for view in views:
+            paths = profiling.profiles(view)
+            if not paths:
+                self.stderr.write(f'{view}: профилей нет')
+                continue
+            durations = [profiling.duration_ms(path) for path in paths]
+            self.stdout.write(
+                f'{view}: профилей {len(paths)}, '
+                f'среднее {sum(durations) / len(durations):.0f} мс, '
+                f'максимум {max(durations)} мс'
+            )
+            self.stdout.write(
+                f'{"вызовы":>10} {"tottime":>9} {"cumtime":>9}  функция'
+            )
+            for function, calls, tottime, cumtime in profiling.hot_functions(
+                paths, options['top'], options['sort']
+            ):
+                self.stdout.write(
+                    f'{calls:>10} {tottime:>9.4f} {cumtime:>9.4f}  {function}'
+                )
+            self.stdout.write('')
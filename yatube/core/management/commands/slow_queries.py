@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import slow_queries
+
+SORT_KEYS = {
+    'total': 'total_ms',
+    'max': 'max_ms',
+    'count': 'count',
+}
+
+
+class Command(BaseCommand):
+    help = 'Сводит журнал медленных запросов по отпечаткам SQL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument(
+            '--sort', choices=tuple(SORT_KEYS), default='total',
+        )
+        parser.add_argument('--log', default=None)
+        parser.add_argument(
+            '--no-explain', action='store_true',
+            help='Не печатать планы запросов.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['log'] or settings.SLOW_QUERY_LOG
+        summary = slow_queries.summarize(slow_queries.read_log(path))
+        if not summary:
+            raise CommandError(f'В журнале {path} нет медленных запросов.')
+        key = SORT_KEYS[options['sort']]
+        summary.sort(key=lambda item: item[key], reverse=True)
+        bounds = [
+            f'≤{bound}' for bound in slow_queries.DURATION_BUCKETS_MS
+        ] + ['>' + str(slow_queries.DURATION_BUCKETS_MS[-1])]
+        for item in summary[:options['top']]:
+            self.stdout.write(
+                f'{item["fingerprint"]}: {item["count"]} раз, '
+                f'всего {item["total_ms"]:.1f} мс, '
+                f'среднее {item["total_ms"] / item["count"]:.1f} мс, '
+                f'максимум {item["max_ms"]:.1f} мс'
+            )
+            self.stdout.write('  ' + item['sql'])
+            histogram = ' '.join(
+                f'{bound}мс:{count}'
+                for bound, count in zip(bounds, item['buckets']) if count
+            )
+            self.stdout.write(f'  время: {histogram}')
+            origins = sorted(
+                item['origins'].items(), key=lambda pair: pair[1],
+                reverse=True,
+            )
+            for origin, count in origins[:3]:
+                self.stdout.write(f'  источник: {origin} ({count})')
+            if item['explain'] and not options['no_explain']:
+                for line in item['explain'].splitlines():
+                    self.stdout.write(f'  план: {line}')
+            self.stdout.write('')
@@ -0,0 +1,224 @@
+"""
+Метрики производительности запросов.
+
+PerformanceMiddleware заводит на время запроса запись RequestTimings в
+локальной памяти потока; SQL-обёртка, бэкенд шаблонов и TieredCache
+дописывают в неё своё время и счётчики. По окончании запроса запись
+уходит в заголовок Server-Timing и в гистограммы процесса, сгруппированные
+по имени view. Гистограммы отдаются в текстовом формате Prometheus.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_local = threading.local()
+
+
+class RequestTimings:
+    """Время и счётчики одного запроса."""
+
+    def __init__(self):
+        self.view = None
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper: время каждого SQL-запроса на соединении.
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - start
+            self.sql_queries += 1
+
+    def server_timing(self, total_seconds):
+        return ', '.join((
+            f'total;dur={total_seconds * 1000:.1f}',
+            f'sql;dur={self.sql_seconds * 1000:.1f}'
+            f';desc="{self.sql_queries} queries"',
+            f'tpl;dur={self.template_seconds * 1000:.1f}',
+            f'cache;desc="hits={self.cache_hits} misses={self.cache_misses}"',
+        ))
+
+
+def current():
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def recording():
+    timings = RequestTimings()
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = None
+
+
+@contextmanager
+def template_rendering():
+    """Время рендеринга; вложенные шаблоны входят во внешний."""
+    timings = current()
+    if timings is None:
+        yield
+        return
+    timings._template_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._template_depth -= 1
+        if not timings._template_depth:
+            timings.template_seconds += time.perf_counter() - start
+
+
+def record_cache(hits=0, misses=0):
+    timings = current()
+    if timings is not None:
+        timings.cache_hits += hits
+        timings.cache_misses += misses
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in labels
+    )
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self._lock:
+            series = {
+                key: list(values) for key, values in self._series.items()
+            }
+        for key, values in sorted(series.items()):
+            for bound, count in zip(self.buckets, values):
+                labels = _format_labels(key + (('le', bound),))
+                lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _format_labels(key + (('le', '+Inf'),))
+            lines.append(f'{self.name}_bucket{labels} {values[-2]}')
+            labels = _format_labels(key)
+            lines.append(f'{self.name}_count{labels} {values[-2]}')
+            lines.append(f'{self.name}_sum{labels} {values[-1]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} counter',
+        ]
+        with self._lock:
+            series = dict(self._series)
+        for key, value in sorted(series.items()):
+            lines.append(f'{self.name}{_format_labels(key)} {value}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    'yatube_request_duration_seconds',
+    'Время обработки запроса.',
+    SECONDS_BUCKETS,
+)
+SQL_QUERIES = Histogram(
+    'yatube_request_sql_queries',
+    'Число SQL-запросов за запрос.',
+    QUERIES_BUCKETS,
+)
+SQL_SECONDS = Histogram(
+    'yatube_request_sql_duration_seconds',
+    'Время SQL-запросов за запрос.',
+    SECONDS_BUCKETS,
+)
+TEMPLATE_SECONDS = Histogram(
+    'yatube_request_template_duration_seconds',
+    'Время рендеринга шаблонов за запрос.',
+    SECONDS_BUCKETS,
+)
+RESPONSES = Counter(
+    'yatube_responses_total',
+    'Ответы по view и коду ответа.',
+)
+CACHE_HITS = Counter('yatube_cache_hits_total', 'Попадания в кэш.')
+CACHE_MISSES = Counter('yatube_cache_misses_total', 'Промахи кэша.')
+SLOW_QUERIES = Counter(
+    'yatube_slow_queries_total',
+    'SQL-запросы дольше SLOW_QUERY_MS.',
+)
+PAGE_CACHE = Counter(
+    'yatube_page_cache_total',
+    'Ответы кэша страниц по view и результату.',
+)
+
+METRICS = (
+    REQUEST_SECONDS, SQL_QUERIES, SQL_SECONDS, TEMPLATE_SECONDS,
+    RESPONSES, CACHE_HITS, CACHE_MISSES, SLOW_QUERIES, PAGE_CACHE,
+)
+
+
+def observe(view, status, total_seconds, timings):
+    REQUEST_SECONDS.observe(total_seconds, view=view)
+    SQL_QUERIES.observe(timings.sql_queries, view=view)
+    SQL_SECONDS.observe(timings.sql_seconds, view=view)
+    TEMPLATE_SECONDS.observe(timings.template_seconds, view=view)
+    RESPONSES.inc(view=view, status=status)
+    if timings.cache_hits:
+        CACHE_HITS.inc(timings.cache_hits, view=view)
+    if timings.cache_misses:
+        CACHE_MISSES.inc(timings.cache_misses, view=view)
+
+
+def render_prometheus():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
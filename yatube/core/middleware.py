@@ -0,0 +1,83 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, routers
+
+PRIMARY_COOKIE = 'yatube_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class PerformanceMiddleware:
+    """
+    Замеряет запрос: общее время, SQL, рендеринг шаблонов и кэш.
+
+    Итог уходит в заголовок Server-Timing и в гистограммы по имени view,
+    которые отдаёт /metrics/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with metrics.recording() as timings, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        metrics.observe(view, response.status_code, total, timings)
+        response['Server-Timing'] = timings.server_timing(total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Имя view нужно журналу медленных запросов ещё во время запроса.
+        timings = metrics.current()
+        if timings is not None:
+            timings.view = request.resolver_match.view_name
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Читает с реплик на страницах из REPLICA_VIEWS, кроме пользователей,
+    которые только что писали: им ставится cookie на
+    REPLICA_STICKY_SECONDS секунд.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.use_replicas(False)
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                str(int(time.time()) + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routers.use_replicas(self._replica_allowed(request))
+
+    @staticmethod
+    def _replica_allowed(request):
+        if (not settings.DATABASE_REPLICAS
+                or request.method not in SAFE_METHODS
+                or request.resolver_match.view_name
+                not in settings.REPLICA_VIEWS):
+            return False
+        try:
+            pinned_until = int(request.COOKIES.get(PRIMARY_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        return pinned_until <= time.time()
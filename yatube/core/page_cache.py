@@ -0,0 +1,168 @@
+"""
+Кэш целых страниц для анонимных посетителей.
+
+Ответ хранится под ключом из хоста, пути и строки запроса вместе с
+версией содержимого страницы и уже сжатым gzip телом: клиенту с
+Accept-Encoding: gzip оно отдаётся как есть. Запись со старой версией
+считается устаревшей, поэтому изменения видны сразу.
+
+Пересчёт страницы — под блокировкой в кэше (single-flight): когда
+популярная страница устаревает под нагрузкой, её рендерит один запрос,
+остальные тем временем получают устаревшую копию (stale-while-revalidate)
+или, если копии нет, ждут новую не дольше PAGE_CACHE_LOCK_WAIT секунд.
+Свежую запись один из запросов пересчитывает заранее с вероятностью,
+растущей к концу её жизни и со временем рендеринга (XFetch), так что
+страница обычно обновляется до истечения срока.
+"""
+import gzip
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import metrics
+from .conditional import content_version
+
+HIT = 'hit'
+MISS = 'miss'
+STALE = 'stale'
+HEADER = 'X-Page-Cache'
+POLL_SECONDS = 0.05
+# Состояния записи.
+FRESH = 'fresh'
+EARLY = 'early'
+
+
+# Страницы и блокировки — мимо локального уровня default-кэша: запись
+# и блокировка должны сразу быть видны всем воркерам.
+def _cache():
+    return caches['shared']
+
+
+def _key(request):
+    location = f'{request.get_host()}{request.get_full_path()}'
+    digest = hashlib.md5(location.encode()).hexdigest()
+    return f'page:{digest}', f'page-lock:{digest}'
+
+
+def _cacheable(request):
+    return (
+        settings.PAGE_CACHE_SECONDS > 0
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+    )
+
+
+def _storable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not response.has_header('Content-Encoding')
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def _state(entry, version):
+    """Свежая ли запись; свежую XFetch иногда отдаёт на пересчёт."""
+    if entry is None or entry['version'] != version:
+        return STALE
+    now = time.time()
+    if now >= entry['expires']:
+        return STALE
+    early = -entry['delta'] * settings.PAGE_CACHE_BETA * math.log(
+        1 - random.random()
+    )
+    return EARLY if now + early >= entry['expires'] else FRESH
+
+
+def _respond(request, entry, result):
+    body = entry['body']
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = HttpResponse(body, content_type=entry['content_type'])
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(
+            gzip.decompress(body), content_type=entry['content_type']
+        )
+    response['Content-Length'] = str(len(response.content))
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if not settings.PUBLIC_PAGES:
+        # Авторизованным та же страница рендерится иначе.
+        patch_vary_headers(response, ('Cookie',))
+    return _mark(request, response, result)
+
+
+def _mark(request, response, result):
+    response[HEADER] = result
+    metrics.PAGE_CACHE.inc(
+        view=request.resolver_match.view_name, result=result
+    )
+    return response
+
+
+def _wait(key, version):
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        entry = _cache().get(key)
+        if entry is not None and entry['version'] == version:
+            return entry
+    return None
+
+
+def _render(request, view, key, version, args, kwargs):
+    start = time.perf_counter()
+    response = view(request, *args, **kwargs)
+    delta = time.perf_counter() - start
+    if _storable(request, response):
+        _cache().set(key, {
+            'version': version,
+            'expires': time.time() + settings.PAGE_CACHE_SECONDS,
+            'delta': delta,
+            'body': gzip.compress(response.content),
+            'content_type': response['Content-Type'],
+        }, settings.PAGE_CACHE_SECONDS + settings.PAGE_CACHE_STALE_SECONDS)
+    return _mark(request, response, MISS)
+
+
+def anonymous_page(get_version):
+    """
+    Кэширует страницу для анонимных посетителей.
+
+    get_version(request, *args, **kwargs) возвращает версию содержимого
+    страницы: запись с другой версией не отдаётся как свежая.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+            key, lock = _key(request)
+            version = content_version(request, get_version, args, kwargs)
+            entry = _cache().get(key)
+            state = _state(entry, version)
+            if state == FRESH:
+                return _respond(request, entry, HIT)
+            if not _cache().add(lock, True, settings.PAGE_CACHE_LOCK_SECONDS):
+                # Страницу уже пересчитывает другой запрос.
+                if entry is not None:
+                    return _respond(
+                        request, entry, HIT if state == EARLY else STALE
+                    )
+                entry = _wait(key, version)
+                if entry is not None:
+                    return _respond(request, entry, HIT)
+                return _mark(request, view(request, *args, **kwargs), MISS)
+            try:
+                return _render(request, view, key, version, args, kwargs)
+            finally:
+                _cache().delete(lock)
+        return wrapper
+    return decorator
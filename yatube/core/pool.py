@@ -0,0 +1,45 @@
+"""
+Общий пул процессов для работы с картинками.
+
+Декодирование и перекодирование картинок Pillow выполняется вне потоков
+запросов: память под пиксели выделяется в процессе пула и не раздувает
+воркер веб-сервера. Процессы стартуют методом spawn и один раз
+настраивают Django.
+"""
+import atexit
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+_executor = None
+
+
+def _init_worker():
+    import django
+
+    from yatube import settings_module
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module())
+    django.setup()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+        # Процессы пула завершаются вместе с воркером, дописав задачи.
+        atexit.register(shutdown)
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,140 @@
+"""
+Профилирование живых запросов.
+
+ProfilingMiddleware запускает cProfile для каждого PROFILE_SAMPLE_RATE-го
+запроса (в среднем) и для запросов с подписанным заголовком
+X-Yatube-Profile. Профиль сохраняется в PROFILE_DIR/<view>/ с длительностью
+запроса в имени файла; в каждом каталоге хранится не больше PROFILE_KEEP
+последних профилей. Команда perf_report сводит профили одного view в
+список самых горячих функций.
+
+cProfile включается только в потоке запроса, поэтому остальные запросы
+процесса не замедляются.
+"""
+import cProfile
+import os
+import pstats
+import random
+import time
+
+from django.conf import settings
+from django.core import signing
+
+HEADER = 'HTTP_X_YATUBE_PROFILE'
+SALT = 'yatube.profile'
+
+
+def make_token():
+    """Значение заголовка X-Yatube-Profile, действующее PROFILE_TOKEN_AGE."""
+    return signing.TimestampSigner(salt=SALT).sign('profile')
+
+
+def _token_valid(token):
+    try:
+        signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=settings.PROFILE_TOKEN_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def should_profile(request):
+    token = request.META.get(HEADER)
+    if token:
+        return _token_valid(token)
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.randrange(rate) == 0
+
+
+def view_dir(view):
+    return os.path.join(settings.PROFILE_DIR, view.replace(':', '__'))
+
+
+def store(profiler, view, seconds):
+    """Сохраняет профиль запроса; возвращает путь к файлу."""
+    directory = view_dir(view)
+    os.makedirs(directory, exist_ok=True)
+    name = f'{time.time_ns()}-{os.getpid()}-{seconds * 1000:.0f}ms.prof'
+    path = os.path.join(directory, name)
+    profiler.dump_stats(path)
+    _prune(directory)
+    return path
+
+
+def _prune(directory):
+    names = sorted(os.listdir(directory))
+    for name in names[:-settings.PROFILE_KEEP]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+
+def duration_ms(path):
+    return int(os.path.basename(path).rsplit('-', 1)[1][:-len('ms.prof')])
+
+
+def stored_views():
+    """Имена view, для которых есть профили."""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    return sorted(
+        name.replace('__', ':')
+        for name in os.listdir(settings.PROFILE_DIR)
+        if os.path.isdir(os.path.join(settings.PROFILE_DIR, name))
+    )
+
+
+def profiles(view):
+    directory = view_dir(view)
+    if not os.path.isdir(directory):
+        return []
+    return [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.endswith('.prof')
+    ]
+
+
+def hot_functions(paths, top=20, sort='tottime'):
+    """
+    Сводит профили и возвращает top самых горячих функций.
+
+    Каждая строка: (функция, число вызовов, собственное время, общее время).
+    """
+    merged = pstats.Stats(*paths)
+    column = {'tottime': 2, 'cumtime': 3}[sort]
+    rows = sorted(
+        merged.stats.items(), key=lambda item: item[1][column], reverse=True
+    )
+    return [
+        (pstats.func_std_string(function), calls, tottime, cumtime)
+        for function, (_, calls, tottime, cumtime, _) in rows[:top]
+    ]
+
+
+class ProfilingMiddleware:
+    """Профилирует выборку запросов и сохраняет профили по имени view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not should_profile(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        seconds = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        path = store(profiler, view, seconds)
+        response['X-Yatube-Profile-Id'] = os.path.relpath(
+            path, settings.PROFILE_DIR
+        )
+        return response
@@ -0,0 +1,29 @@
+"""
+Публичные страницы, одинаковые для всех посетителей.
+
+При PUBLIC_PAGES ленты и страница поста рендерятся как для анонима: view
+не читает сессию, поэтому в ответе нет Vary: Cookie, а Cache-Control:
+public позволяет обратному прокси или CDN держать одну копию на всех.
+Личные части (меню пользователя, кнопка подписки, форма комментария с
+CSRF-токеном) страница догружает с некэшируемого posts:fragments.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+
+
+def public_page(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not settings.PUBLIC_PAGES or request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        request.user = AnonymousUser()
+        request.public_page = True
+        response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304) and not response.cookies:
+            response['Cache-Control'] = (
+                f'public, max-age=0, s-maxage={settings.PUBLIC_PAGES_MAX_AGE}'
+            )
+        return response
+    return wrapper
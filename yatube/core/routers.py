@@ -0,0 +1,48 @@
+"""
+Чтение с реплик.
+
+ReplicaRoutingMiddleware разрешает чтение с реплик на время безопасного
+запроса к странице из REPLICA_VIEWS. Остальные запросы, команды и
+фоновые потоки читают с основной базы. После пишущего запроса браузер
+получает cookie, и следующие REPLICA_STICKY_SECONDS секунд его запросы
+тоже читают с основной базы: страница после редиректа не отстаёт от
+только что сделанной записи.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+
+def replica_reads():
+    return getattr(_state, 'replica', False)
+
+
+def use_replicas(enabled):
+    _state.replica = enabled
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if (not settings.DATABASE_REPLICAS or not replica_reads()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы: связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
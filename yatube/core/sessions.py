@@ -0,0 +1,37 @@
+"""
+Сессии в общем кэше с отложенной записью в БД.
+
+Сессия читается из кэша, как у cached_db, а в БД идёт только при промахе.
+Изменения существующей сессии сразу пишутся в кэш, а в таблицу сессий —
+потоком-писателем write_queue без ожидания (write-behind). Новые ключи
+(вход, смена ключа) и удаление при выходе пишутся сразу: ключ должен быть
+уникальным, а удалённая сессия — сразу недействительной.
+"""
+from django.contrib.sessions.backends.cached_db import (
+    SessionStore as CachedDBStore,
+)
+
+from . import write_queue
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = 'core.sessions'
+
+    def save(self, must_create=False):
+        if self.session_key is None or must_create:
+            return super().save(must_create)
+        data = self._get_session()
+        self._cache.set(self.cache_key, data, self.get_expiry_age())
+        write_queue.defer(
+            self._persist,
+            self.session_key,
+            self.encode(data),
+            self.get_expiry_date(),
+        )
+
+    @classmethod
+    def _persist(cls, session_key, session_data, expire_date):
+        # Сессию, удалённую до записи, не восстанавливаем.
+        cls.get_model_class().objects.filter(session_key=session_key).update(
+            session_data=session_data, expire_date=expire_date,
+        )
@@ -0,0 +1,186 @@
+"""
+Журнал медленных SQL-запросов.
+
+Обёртка execute_wrapper ставится на каждое соединение с БД при его
+открытии и замеряет все запросы. Запрос дольше SLOW_QUERY_MS попадает в
+SLOW_QUERY_LOG строкой JSON: отпечаток (SQL без литералов и с
+однотипными списками IN), длительность, view, строка шаблона и строка
+кода проекта, из которых пришёл запрос. План запроса (EXPLAIN бэкенда)
+снимается один раз на отпечаток в процессе. Команда slow_queries сводит
+журнал по отпечаткам.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_SPACES = re.compile(r'\s+')
+_CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_explained = set()
+_write_lock = threading.Lock()
+_local = threading.local()
+
+
+def normalize(sql):
+    """SQL без литералов: запросы одной формы дают одну строку."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDERS.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def _origin():
+    """Строка шаблона и строка кода проекта, из которых пришёл запрос."""
+    template = code = None
+    frame = sys._getframe(2)
+    while frame is not None and not (template and code):
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                template = f'{origin.template_name}:{token.lineno}'
+        filename = frame.f_code.co_filename
+        if (code is None and filename.startswith(settings.BASE_DIR)
+                and not filename.startswith(_CORE_DIR)):
+            code = (
+                f'{os.path.relpath(filename, settings.BASE_DIR)}:'
+                f'{frame.f_lineno}'
+            )
+        frame = frame.f_back
+    return template, code
+
+
+def explain(connection, sql, params):
+    """План запроса; выполняется мимо обёрток, чтобы не зациклиться."""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    prefix = connection.ops.explain_query_prefix()
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'{prefix} {sql}', params)
+        return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    except Exception as error:
+        return f'EXPLAIN не выполнен: {error}'
+    finally:
+        cursor.close()
+
+
+def record(connection, sql, params, duration_ms):
+    normalized = normalize(sql)
+    key = fingerprint(normalized)
+    template, code = _origin()
+    timings = metrics.current()
+    view = timings.view if timings is not None else None
+    entry = {
+        'time': time.time(),
+        'fingerprint': key,
+        'sql': normalized,
+        'duration_ms': round(duration_ms, 3),
+        'view': view,
+        'template': template,
+        'code': code,
+        'vendor': connection.vendor,
+    }
+    if key not in _explained:
+        _explained.add(key)
+        entry['explain'] = explain(connection, sql, params)
+    metrics.SLOW_QUERIES.inc(view=view or 'none')
+    logger.warning(
+        'Медленный запрос %s %.1f мс (%s, %s): %s',
+        key, duration_ms, view, template or code, normalized,
+    )
+    line = json.dumps(entry, ensure_ascii=False) + '\n'
+    with _write_lock:
+        with open(settings.SLOW_QUERY_LOG, 'a', encoding='utf-8') as log:
+            log.write(line)
+
+
+class SlowQueryWrapper:
+    def __call__(self, execute, sql, params, many, context):
+        threshold = settings.SLOW_QUERY_MS
+        if threshold is None or getattr(_local, 'recording', False):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms >= threshold and not many:
+                _local.recording = True
+                try:
+                    record(context['connection'], sql, params, duration_ms)
+                except Exception:
+                    logger.exception('Не удалось записать медленный запрос')
+                finally:
+                    _local.recording = False
+
+
+wrapper = SlowQueryWrapper()
+
+
+def install(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(wrapper)
+
+
+def read_log(path):
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as log:
+        for line in log:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def summarize(entries):
+    """Сводка по отпечаткам: число, время, гистограмма, источники, план."""
+    summary = {}
+    for entry in entries:
+        item = summary.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'],
+            'sql': entry['sql'],
+            'count': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'buckets': [0] * (len(DURATION_BUCKETS_MS) + 1),
+            'origins': {},
+            'explain': None,
+        })
+        duration = entry['duration_ms']
+        item['count'] += 1
+        item['total_ms'] += duration
+        item['max_ms'] = max(item['max_ms'], duration)
+        item['buckets'][bisect_left(DURATION_BUCKETS_MS, duration)] += 1
+        origin = ' '.join(filter(None, (
+            entry.get('view'), entry.get('template'), entry.get('code'),
+        ))) or '?'
+        item['origins'][origin] = item['origins'].get(origin, 0) + 1
+        if item['explain'] is None and entry.get('explain'):
+            item['explain'] = entry['explain']
+    return list(summary.values())
@@ -1,4 +1,33 @@
-from django.test import TestCase
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings,
+)
+from django.urls import resolve, reverse
+from django.test.utils import CaptureQueriesContext
+
+from . import (auth, metrics, profiling, routers, slow_queries,
+               write_queue)
+from .backends.sqlite3.base import DatabaseWrapper
+from .checks import check_session_cache, performance_issues
+from .middleware import PRIMARY_COOKIE, ReplicaRoutingMiddleware
+from .sessions import SessionStore
+from .cache import TieredCache, stats
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -11,3 +40,542 @@ class ViewTestClass(TestCase):
             template,
             f'response = {response}, template = {template}'
         )
+
+
+class TieredCacheTest(TestCase):
+    def setUp(self):
+        self.cache = TieredCache('shared', {
+            'OPTIONS': {'LOCAL_MAX_ENTRIES': 2, 'LOCAL_TIMEOUT': 60},
+        })
+        self.cache.clear()
+        stats.clear()
+
+    def test_local_tier_serves_repeated_reads(self):
+        """Повторное чтение обслуживается локальным уровнем"""
+        caches['shared'].set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get('missing'), None)
+        self.assertEqual(stats['shared_hits'], 1)
+        self.assertEqual(stats['local_hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_local_tier_is_bounded_lru(self):
+        """Локальный уровень вытесняет самые старые ключи"""
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(len(self.cache._local), 2)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(stats['shared_hits'], 1)
+
+    def test_delete_reaches_both_tiers(self):
+        """Удаление сбрасывает ключ на обоих уровнях"""
+        self.cache.set('key', 'value')
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertIsNone(caches['shared'].get('key'))
+
+    def test_stats_endpoint_is_staff_only(self):
+        """Счётчики кэша доступны только персоналу"""
+        response = self.client.get('/cache-stats/')
+        self.assertEqual(response.status_code, 302)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/cache-stats/')
+        self.assertIn('hit_ratio', response.json())
+
+
+class PerformanceMiddlewareTest(TestCase):
+    def test_server_timing_header(self):
+        """Ответ несёт заголовок Server-Timing с SQL и шаблонами"""
+        response = self.client.get('/')
+        timing = response['Server-Timing']
+        for part in ('total;dur=', 'sql;dur=', 'queries"', 'tpl;dur=',
+                     'cache;desc="hits='):
+            self.assertIn(part, timing)
+
+    def test_metrics_histograms_by_view(self):
+        """/metrics/ отдаёт гистограммы запросов по имени view"""
+        self.client.get('/')
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      body)
+        self.assertIn(
+            'yatube_request_sql_queries_count{view="posts:home"}', body
+        )
+        self.assertIn('le="+Inf"', body)
+
+    def test_metrics_access(self):
+        """/metrics/ доступен только персоналу, даже с адреса прокси"""
+        remote = {'REMOTE_ADDR': '203.0.113.5'}
+        self.assertEqual(
+            self.client.get('/metrics/', **remote).status_code, 403
+        )
+        self.assertEqual(
+            self.client.get('/metrics/', REMOTE_ADDR='127.0.0.1').status_code,
+            403,
+        )
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(
+            self.client.get('/metrics/', **remote).status_code, 200
+        )
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics_bearer_token(self):
+        """Сборщик метрик входит по токену из настроек"""
+        for header, status in (
+            ('Bearer scrape-token', 200),
+            ('Bearer wrong-token', 403),
+            ('', 403),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    '/metrics/', HTTP_AUTHORIZATION=header
+                )
+                self.assertEqual(response.status_code, status)
+
+
+class HistogramTest(TestCase):
+    def test_buckets_are_cumulative(self):
+        """Корзины гистограммы накопительные"""
+        histogram = metrics.Histogram('test', 'Тест.', (1, 10))
+        for value in (0.5, 5, 50):
+            histogram.observe(value, view='v')
+        lines = histogram.render()
+        self.assertIn('test_bucket{view="v",le="1"} 1', lines)
+        self.assertIn('test_bucket{view="v",le="10"} 2', lines)
+        self.assertIn('test_bucket{view="v",le="+Inf"} 3', lines)
+        self.assertIn('test_sum{view="v"} 55.5', lines)
+
+
+class ProfilingTest(TestCase):
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir, ignore_errors=True)
+
+    def test_sampled_request_is_stored(self):
+        """Выбранный запрос профилируется и сохраняется по имени view"""
+        with self.settings(PROFILE_DIR=self.profile_dir,
+                           PROFILE_SAMPLE_RATE=1):
+            response = self.client.get('/')
+            self.assertIn('X-Yatube-Profile-Id', response)
+            self.assertEqual(profiling.stored_views(), ['posts:home'])
+            self.assertEqual(len(profiling.profiles('posts:home')), 1)
+
+    @override_settings(PROFILE_SAMPLE_RATE=0)
+    def test_signed_header_forces_profile(self):
+        """Подписанный заголовок включает профилирование, чужой — нет"""
+        with self.settings(PROFILE_DIR=self.profile_dir):
+            response = self.client.get('/', HTTP_X_YATUBE_PROFILE='forged')
+            self.assertNotIn('X-Yatube-Profile-Id', response)
+            response = self.client.get(
+                '/', HTTP_X_YATUBE_PROFILE=profiling.make_token()
+            )
+            self.assertIn('X-Yatube-Profile-Id', response)
+
+    def test_store_keeps_latest_profiles(self):
+        """В каталоге view остаются только последние профили"""
+        with self.settings(PROFILE_DIR=self.profile_dir, PROFILE_KEEP=2,
+                           PROFILE_SAMPLE_RATE=1):
+            for _ in range(3):
+                self.client.get('/')
+            self.assertEqual(len(profiling.profiles('posts:home')), 2)
+
+    def test_perf_report(self):
+        """perf_report выводит горячие функции по каждому view"""
+        with self.settings(PROFILE_DIR=self.profile_dir,
+                           PROFILE_SAMPLE_RATE=1):
+            self.client.get('/')
+            self.client.get('/group/missing/')
+            out = StringIO()
+            call_command('perf_report', top=5, stdout=out)
+        report = out.getvalue()
+        self.assertIn('posts:home: профилей 1', report)
+        self.assertIn('posts:group', report)
+        self.assertIn('tottime', report)
+
+
+class SlowQueryLogTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.log = f'{directory}/slow.log'
+        slow_queries._explained.clear()
+
+    def test_normalize(self):
+        """Отпечаток не зависит от литералов и длины списков IN"""
+        first = slow_queries.normalize(
+            "SELECT * FROM t WHERE id IN (%s, %s) AND name = 'a'"
+        )
+        second = slow_queries.normalize(
+            "SELECT *  FROM t WHERE id IN (%s, %s, %s) AND name = 'b''c'"
+        )
+        self.assertEqual(
+            first, 'SELECT * FROM t WHERE id IN (...) AND name = ?'
+        )
+        self.assertEqual(first, second)
+
+    def test_slow_queries_are_logged_with_origin(self):
+        """Запросы сверх порога попадают в журнал с view и планом"""
+        with self.settings(SLOW_QUERY_MS=0, SLOW_QUERY_LOG=self.log):
+            self.client.get('/')
+            self.client.get('/')
+        entries = list(slow_queries.read_log(self.log))
+        self.assertTrue(entries)
+        self.assertEqual({entry['view'] for entry in entries}, {'posts:home'})
+        self.assertTrue(any(entry['code'] for entry in entries))
+        explained = [entry for entry in entries if 'explain' in entry]
+        self.assertEqual(
+            len(explained),
+            len({entry['fingerprint'] for entry in entries}),
+        )
+
+    def test_fast_queries_are_not_logged(self):
+        """Быстрые запросы в журнал не попадают"""
+        with self.settings(SLOW_QUERY_MS=10_000, SLOW_QUERY_LOG=self.log):
+            self.client.get('/')
+        self.assertEqual(list(slow_queries.read_log(self.log)), [])
+
+    def test_report_command(self):
+        """slow_queries сводит журнал по отпечаткам"""
+        with self.settings(SLOW_QUERY_MS=0, SLOW_QUERY_LOG=self.log):
+            self.client.get('/')
+            out = StringIO()
+            call_command('slow_queries', top=3, stdout=out)
+        report = out.getvalue()
+        self.assertIn('источник: posts:home', report)
+        self.assertIn('план:', report)
+
+
+class PerfCheckTest(TestCase):
+    def test_hostile_settings_are_reported(self):
+        """perf_check перечисляет вредные для скорости настройки"""
+        with self.settings(SLOW_QUERY_MS=0, IMAGE_REENCODE='inline'):
+            ids = {issue.id for issue in performance_issues()}
+            self.assertIn('yatube.W006', ids)
+            self.assertIn('yatube.W009', ids)
+            out = StringIO()
+            with self.assertRaises(CommandError):
+                call_command('perf_check', stdout=out)
+        self.assertIn('yatube.W006', out.getvalue())
+
+    def test_sessions_in_process_cache_fail_deploy_check(self):
+        """Сессии в locmem не проходят check --deploy"""
+        shared = {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+        with self.settings(CACHES={**settings.CACHES, 'shared': shared}):
+            ids = {issue.id for issue in check_session_cache(None)}
+            self.assertEqual(ids, {'yatube.E001'})
+        shared = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': settings.BASE_DIR,
+        }
+        with self.settings(CACHES={**settings.CACHES, 'shared': shared}):
+            self.assertEqual(check_session_cache(None), [])
+
+    def test_production_settings_pass(self):
+        """Боевые настройки проходят perf_check и не импортируют toolbar"""
+        script = (
+            'import sys, django; django.setup(); import yatube.urls; '
+            'from django.core.management import call_command; '
+            'call_command("perf_check"); '
+            'call_command("check", deploy=True, fail_level="ERROR"); '
+            'assert "debug_toolbar" not in sys.modules'
+        )
+        env = {**os.environ, 'YATUBE_ENV': 'production'}
+        env['DJANGO_SETTINGS_MODULE'] = 'yatube.settings_production'
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('в порядке', result.stdout)
+
+
+class TunedSqliteTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.database = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(directory, 'tuned.sqlite3'),
+            'PRAGMAS': {'cache_size': -1000},
+        }, alias='tuned')
+        self.addCleanup(self.database.close)
+
+    def pragma(self, name):
+        with self.database.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        """Соединение включает WAL, busy_timeout и переданные прагмы"""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('cache_size'), -1000)
+
+    def test_transactions_begin_immediate(self):
+        """Транзакция сразу берёт блокировку записи"""
+        with CaptureQueriesContext(self.database) as queries:
+            self.database._start_transaction_under_autocommit()
+        self.assertTrue(self.database.connection.in_transaction)
+        self.database.connection.rollback()
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+@override_settings(WRITE_BATCHING=True, WRITE_BATCH_WAIT_MS=200)
+class WriteQueueTest(TransactionTestCase):
+    def setUp(self):
+        self.addCleanup(write_queue.shutdown)
+
+    def run_concurrently(self, calls):
+        results = [None] * len(calls)
+
+        def worker(index):
+            try:
+                results[index] = calls[index]()
+            except Exception as error:
+                results[index] = error
+
+        threads = [
+            threading.Thread(target=worker, args=(index,))
+            for index in range(len(calls))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def submit_concurrently(self, operations):
+        return self.run_concurrently([
+            lambda operation=operation: write_queue.submit(operation)
+            for operation in operations
+        ])
+
+    def test_concurrent_writes_share_transaction(self):
+        """Одновременные записи фиксируются одной транзакцией"""
+        def in_transaction():
+            return connection.in_atomic_block
+
+        results = self.submit_concurrently([in_transaction] * 10)
+        self.assertEqual(results, [True] * 10)
+        self.assertLess(write_queue.get_queue().batches, 10)
+
+    def test_failed_operation_does_not_break_batch(self):
+        """Ошибка одной записи достаётся только её запросу"""
+        def fail():
+            raise ValueError('ошибка')
+
+        def create():
+            return User.objects.create(username='batched').pk
+
+        results = self.submit_concurrently([fail, create])
+        self.assertIsInstance(results[0], ValueError)
+        self.assertTrue(User.objects.filter(pk=results[1]).exists())
+
+    def test_deferred_write_runs_in_background(self):
+        """Отложенная запись выполняется без ожидания и до остановки"""
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_create():
+            started.set()
+            release.wait(5)
+            User.objects.create(username='deferred')
+
+        write_queue.defer(slow_create)
+        self.assertTrue(started.wait(5))
+        self.assertFalse(User.objects.filter(username='deferred').exists())
+        release.set()
+        write_queue.shutdown()
+        self.assertTrue(User.objects.filter(username='deferred').exists())
+
+    def test_timed_out_write_is_cancelled(self):
+        """Запись, не дождавшаяся пачки, отменяется и не выполняется"""
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+
+        write_queue.defer(slow)
+        self.assertTrue(started.wait(5))
+        with self.settings(WRITE_BATCH_TIMEOUT=0.1):
+            with self.assertRaises(TimeoutError):
+                write_queue.submit(
+                    User.objects.create, username='timed-out'
+                )
+        release.set()
+        write_queue.shutdown()
+        self.assertFalse(User.objects.filter(username='timed-out').exists())
+
+    def test_similar_writes_run_as_one_call(self):
+        """Однотипные записи пачки выполняются одним вызовом"""
+        calls = []
+
+        def double(items):
+            calls.append(len(items))
+            if 'bad' in items:
+                raise ValueError('ошибка')
+            return [item * 2 for item in items]
+
+        def submit(item):
+            return lambda: write_queue.submit_many(double, item)
+
+        results = self.run_concurrently([submit(n) for n in range(8)])
+        self.assertEqual(results, [n * 2 for n in range(8)])
+        self.assertLess(len(calls), 8)
+        results = self.run_concurrently([submit('bad'), submit('ok')])
+        self.assertIsInstance(results[0], ValueError)
+        self.assertEqual(results[1], 'okok')
+
+    def test_open_transaction_writes_inline(self):
+        """Внутри транзакции запроса запись выполняется сразу"""
+        from django.db import transaction
+
+        with transaction.atomic():
+            thread = write_queue.submit(threading.get_ident)
+        self.assertEqual(thread, threading.get_ident())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(
+            lambda request: HttpResponse()
+        )
+        self.addCleanup(routers.use_replicas, False)
+
+    def route(self, request):
+        request.resolver_match = resolve(request.path)
+        self.middleware.process_view(request, None, (), {})
+        return self.router.db_for_read(User)
+
+    def test_reads_primary_by_default(self):
+        """Без разрешения middleware чтение идёт с основной базы"""
+        self.assertEqual(self.router.db_for_read(User), 'default')
+        routers.use_replicas(True)
+        self.assertEqual(self.router.db_for_read(User), 'replica1')
+        self.assertEqual(self.router.db_for_write(User), 'default')
+
+    def test_replica_views(self):
+        """Страницы из REPLICA_VIEWS читают с реплики, остальные — нет"""
+        self.assertEqual(self.route(self.factory.get('/')), 'replica1')
+        self.assertEqual(
+            self.route(self.factory.get('/create/')), 'default'
+        )
+        self.assertEqual(self.route(self.factory.post('/')), 'default')
+
+    def test_writes_pin_to_primary(self):
+        """После записи пользователь какое-то время читает с основной базы"""
+        response = self.middleware(self.factory.post('/create/'))
+        pinned = response.cookies[PRIMARY_COOKIE]
+        self.assertEqual(pinned['max-age'], settings.REPLICA_STICKY_SECONDS)
+        request = self.factory.get('/')
+        request.COOKIES[PRIMARY_COOKIE] = pinned.value
+        self.assertEqual(self.route(request), 'default')
+        request.COOKIES[PRIMARY_COOKIE] = '0'
+        self.assertEqual(self.route(request), 'replica1')
+
+    def test_reset_after_request(self):
+        """Разрешение читать с реплик не переживает запрос"""
+        routers.use_replicas(True)
+        self.middleware(self.factory.get('/'))
+        self.assertFalse(routers.replica_reads())
+
+
+class CachedAuthTest(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.user = User.objects.create_user(
+            username='cached', password='secret-password',
+        )
+        self.client.force_login(self.user)
+        self.url = reverse('about:author')
+
+    def test_no_auth_queries_when_warm(self):
+        """Сессия и пользователь берутся из кэша без запросов к БД"""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'cached')
+
+    def test_password_change_logs_out(self):
+        """Смена пароля сразу сбрасывает снимок пользователя"""
+        self.client.get(self.url)
+        self.user.set_password('another-password')
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Войти')
+
+    def test_own_password_change_keeps_session(self):
+        """После смены своего пароля пользователь остаётся в системе"""
+        self.client.get(self.url)
+        response = self.client.post(reverse('password_change'), {
+            'old_password': 'secret-password',
+            'new_password1': 'another-password-42',
+            'new_password2': 'another-password-42',
+        })
+        self.assertRedirects(response, reverse('password_change_done'))
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'Войти')
+
+    def test_logout_drops_snapshot(self):
+        """При выходе снимок пользователя удаляется из кэша"""
+        self.client.get(self.url)
+        self.assertIsNotNone(caches['shared'].get(auth._key(self.user.pk)))
+        self.client.logout()
+        self.assertIsNone(caches['shared'].get(auth._key(self.user.pk)))
+
+    def test_snapshot_has_no_password(self):
+        """В снимке нет пароля, а хеш сессии берётся из снимка"""
+        self.client.get(self.url)
+        values = caches['shared'].get(auth._key(self.user.pk))
+        self.assertNotIn('password', values['fields'])
+        self.assertNotIn(self.user.password, str(values))
+        with self.assertNumQueries(0):
+            user = auth.CachedModelBackend().get_user(self.user.pk)
+            self.assertEqual(
+                user.get_session_auth_hash(),
+                self.user.get_session_auth_hash(),
+            )
+            self.assertEqual(user.username, 'cached')
+
+    def test_session_changes_reach_database(self):
+        """Изменения сессии видны из кэша и дописываются в БД"""
+        session = SessionStore()
+        session['step'] = 1
+        session.create()
+        session['step'] = 2
+        session.save()
+        self.assertEqual(SessionStore(session.session_key)['step'], 2)
+        row = SessionStore.get_model_class().objects.get(
+            session_key=session.session_key
+        )
+        self.assertEqual(row.get_decoded()['step'], 2)
+
+    def test_deleted_session_is_not_restored(self):
+        """Отложенная запись не восстанавливает удалённую сессию"""
+        session = SessionStore()
+        session.create()
+        key = session.session_key
+        data = session.encode({'step': 1})
+        session.delete()
+        SessionStore._persist(key, data, session.get_expiry_date())
+        self.assertFalse(
+            SessionStore.get_model_class().objects.filter(
+                session_key=key
+            ).exists()
+        )
@@ -0,0 +1,26 @@
+"""
+Потоковый приём загружаемых файлов.
+
+Файл всегда пишется кусками во временный файл на диске, а не в память.
+Всё, что приходит сверх FILE_UPLOAD_MAX_SIZE, отбрасывается без записи:
+на диске остаётся не больше лимита, а файл помечается как слишком
+большой, чтобы форма отклонила его с понятной ошибкой.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received <= settings.FILE_UPLOAD_MAX_SIZE:
+            self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        upload.oversized = self.received > settings.FILE_UPLOAD_MAX_SIZE
+        return upload
@@ -0,0 +1,249 @@
+"""
+Групповая фиксация мелких записей.
+
+При WRITE_BATCHING мелкие записи запросов (комментарии, подписки) не
+открывают каждая свою транзакцию, а попадают в очередь процесса. Один
+поток-писатель забирает из неё до WRITE_BATCH_SIZE операций или ждёт
+следующих не дольше WRITE_BATCH_WAIT_MS и выполняет пачку в одной
+транзакции, каждую операцию в своей точке сохранения: ошибка одной
+операции не откатывает остальные. Однотипные записи, отправленные через
+submit_many, выполняются одним вызовом на всю пачку (например, одним
+INSERT и одним обновлением счётчика). Запрос ждёт, пока транзакция его
+пачки не зафиксирована, и получает результат или исключение своей
+операции. Если пачка не начата за WRITE_BATCH_TIMEOUT, запись
+отменяется и запрос получает TimeoutError; начатую пачку запрос
+дожидается, поэтому ошибка всегда значит, что записи не было. Запись
+через defer ставится в ту же очередь, но запрос её не ждёт
+(write-behind): так сохраняются сессии, уже записанные в кэш.
+
+С одной транзакцией на пачку база с единственным писателем (SQLite)
+делает одну синхронизацию журнала вместо десятков, а запросы не
+выстраиваются в очередь за блокировкой записи.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class _Job:
+    def __init__(self, operation, args, kwargs, many=False, deferred=False):
+        self.operation = operation
+        self.args = args
+        self.kwargs = kwargs
+        self.many = many
+        self.deferred = deferred
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        self._claimed = False
+        self._cancelled = False
+
+    def claim(self):
+        """Писатель берёт запись; False, если запрос её уже отменил."""
+        with self._lock:
+            if not self._cancelled:
+                self._claimed = True
+            return self._claimed
+
+    def cancel(self):
+        """Запрос отменяет запись; False, если писатель её уже взял."""
+        with self._lock:
+            if not self._claimed:
+                self._cancelled = True
+            return self._cancelled
+
+
+class GroupCommitQueue:
+    def __init__(self, batch_size, wait_seconds):
+        self.batch_size = batch_size
+        self.wait_seconds = wait_seconds
+        self.batches = 0
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name='write-queue', daemon=True,
+        )
+        self._thread.start()
+
+    def submit(self, operation, *args, **kwargs):
+        return self._wait(_Job(operation, args, kwargs))
+
+    def submit_many(self, operation, item):
+        return self._wait(_Job(operation, (item,), {}, many=True))
+
+    def defer(self, operation, *args, **kwargs):
+        self._jobs.put(_Job(operation, args, kwargs, deferred=True))
+
+    def _wait(self, job):
+        self._jobs.put(job)
+        if not job.done.wait(settings.WRITE_BATCH_TIMEOUT):
+            if job.cancel():
+                raise TimeoutError('Пачка записей не начата вовремя.')
+            # Пачка уже выполняется: её результат будет известен.
+            job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def stop(self):
+        self._jobs.put(_STOP)
+        self._thread.join()
+
+    def _next_batch(self):
+        first = self._jobs.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.wait_seconds
+        while len(batch) < self.batch_size:
+            try:
+                job = self._jobs.get(
+                    timeout=max(0, deadline - time.monotonic())
+                )
+            except queue.Empty:
+                break
+            if job is _STOP:
+                self._jobs.put(_STOP)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                self._commit(batch)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _execute(job):
+        try:
+            with transaction.atomic():
+                if job.many:
+                    job.result = job.operation(list(job.args))[0]
+                else:
+                    job.result = job.operation(*job.args, **job.kwargs)
+        except Exception as error:
+            job.error = error
+
+    @staticmethod
+    def _execute_many(operation, jobs):
+        try:
+            with transaction.atomic():
+                results = operation([job.args[0] for job in jobs])
+        except Exception:
+            # Ошибку пачки находим по одной записи.
+            for job in jobs:
+                GroupCommitQueue._execute(job)
+            return
+        for job, result in zip(jobs, results):
+            job.result = result
+
+    def _commit(self, batch):
+        batch = [job for job in batch if job.claim()]
+        if not batch:
+            return
+        grouped = {}
+        try:
+            with transaction.atomic():
+                for job in batch:
+                    if job.many:
+                        grouped.setdefault(job.operation, []).append(job)
+                    else:
+                        self._execute(job)
+                for operation, jobs in grouped.items():
+                    self._execute_many(operation, jobs)
+        except Exception as error:
+            logger.exception(
+                'Пачка из %s записей не зафиксирована', len(batch)
+            )
+            for job in batch:
+                job.result = None
+                job.error = job.error or error
+            connection.close()
+        finally:
+            self.batches += 1
+            for job in batch:
+                if job.deferred and job.error is not None:
+                    logger.error(
+                        'Отложенная запись %r не выполнена: %s',
+                        job.operation, job.error,
+                    )
+                job.done.set()
+
+
+_queue = None
+_queue_pid = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Очередь процесса; после fork воркера создаётся заново."""
+    global _queue, _queue_pid
+    with _queue_lock:
+        if _queue is None or _queue_pid != os.getpid():
+            _queue = GroupCommitQueue(
+                settings.WRITE_BATCH_SIZE,
+                settings.WRITE_BATCH_WAIT_MS / 1000,
+            )
+            _queue_pid = os.getpid()
+        return _queue
+
+
+def shutdown():
+    global _queue
+    with _queue_lock:
+        if _queue is not None and _queue_pid == os.getpid():
+            _queue.stop()
+        _queue = None
+
+
+# Отложенные записи дописываются при выходе процесса.
+atexit.register(shutdown)
+
+
+def submit(operation, *args, **kwargs):
+    """
+    Выполняет мелкую запись: через очередь при WRITE_BATCHING, иначе
+    сразу, как раньше. Внутри открытой транзакции запись тоже выполняется
+    сразу, иначе она оказалась бы вне этой транзакции.
+    """
+    if not settings.WRITE_BATCHING or connection.in_atomic_block:
+        return operation(*args, **kwargs)
+    return get_queue().submit(operation, *args, **kwargs)
+
+
+def submit_many(operation, item):
+    """
+    Однотипная запись: operation(items) получает все такие записи пачки
+    и возвращает результаты в том же порядке. Без очереди — список из
+    одного элемента.
+    """
+    if not settings.WRITE_BATCHING or connection.in_atomic_block:
+        return operation([item])[0]
+    return get_queue().submit_many(operation, item)
+
+
+def defer(operation, *args, **kwargs):
+    """
+    Запись без ожидания: выполняется потоком-писателем в одной из
+    следующих пачек, ошибки только логируются. Внутри открытой транзакции
+    выполняется сразу.
+    """
+    if connection.in_atomic_block:
+        operation(*args, **kwargs)
+        return
+    get_queue().defer(operation, *args, **kwargs)
@@ -0,0 +1,92 @@
+"""
+Версии содержимого для ключей кэша.
+
+Каждой области (общая лента, группа, автор, подписки пользователя)
+соответствует счётчик-поколение в кэше. Сохранение и удаление постов,
+комментариев, групп и подписок сдвигают версии затронутых областей, а
+фрагменты шаблонов включают версию в ключ. Поэтому фрагменты могут жить
+часами и при этом устаревают сразу после изменения.
+
+Версия — время последнего изменения области в наносекундах: её можно
+использовать и как Last-Modified.
+
+Внутри транзакции версия сдвигается дважды: сразу, чтобы пишущий запрос
+видел своё изменение, и после фиксации — иначе параллельный читатель,
+увидевший новую версию до фиксации, закэшировал бы под ней старые строки.
+"""
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+FEED = 'feed'
+KEY_PREFIX = 'content-version'
+
+
+# Версии читаются мимо локального уровня default-кэша: иначе другие
+# воркеры видели бы сдвиг с опозданием до LOCAL_TIMEOUT.
+def _cache():
+    return caches['shared']
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def follows_scope(user_id):
+    return f'follows:{user_id}'
+
+
+def author_card_scope(author_id):
+    """Подпись автора в карточках его постов."""
+    return f'card-author:{author_id}'
+
+
+def group_card_scope(group_id):
+    """Ссылка на группу в карточках её постов."""
+    return f'card-group:{group_id}'
+
+
+def _key(scope):
+    return f'{KEY_PREFIX}:{scope}'
+
+
+def versions(*scopes):
+    """Версии областей; у вытесненных из кэша заводится новая."""
+    keys = [_key(scope) for scope in scopes]
+    found = _cache().get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        _cache().set_many(missing, timeout=None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def version_key(*scopes):
+    """Строка для ключа фрагмента, меняющаяся вместе с любой из областей."""
+    return '.'.join(str(version) for version in versions(*scopes))
+
+
+def _set_now(keys):
+    now = time.time_ns()
+    _cache().set_many({key: now for key in keys}, timeout=None)
+
+
+def bump(*scopes):
+    keys = [_key(scope) for scope in scopes if scope is not None]
+    _set_now(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _set_now(keys))
+
+
+def bump_post(author_id, *group_ids):
+    """Сдвигает версии лент, в которых показывается пост."""
+    bump(
+        FEED,
+        author_scope(author_id),
+        *(group_scope(group_id) for group_id in group_ids if group_id),
+    )
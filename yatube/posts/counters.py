@@ -0,0 +1,145 @@
+"""
+Денормализованные счётчики: посты автора и группы, комментарии поста,
+подписчики и подписки пользователя.
+
+Счётчики меняются атомарными UPDATE ... SET n = n + 1 из сигналов в
+транзакции сохранения или удаления. recount_all пересчитывает их с нуля
+и чинит расхождения (команда recount_counters и миграция данных).
+"""
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count_of(model, field):
+    """Подзапрос COUNT(*) строк model, ссылающихся на внешнюю запись."""
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def _bump(queryset, field, delta):
+    if delta < 0:
+        # Не уводим разошедшийся счётчик в минус: его починит пересчёт.
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def user_stats(user):
+    """Счётчики пользователя; при отсутствии строки пересчитывает их."""
+    UserStats = global_apps.get_model('posts', 'UserStats')
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        user.stats = recount_user(user.pk)
+        return user.stats
+
+
+def recount_user(user_id, apps=global_apps):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    UserStats = apps.get_model('posts', 'UserStats')
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id
+            ).count(),
+        },
+    )
+    return stats
+
+
+def bump_user(user_id, field, delta):
+    UserStats = global_apps.get_model('posts', 'UserStats')
+    updated = _bump(UserStats.objects.filter(user_id=user_id), field, delta)
+    if not updated and delta > 0:
+        # Строки ещё нет (например, после bulk_create) — считаем точно.
+        recount_user(user_id)
+
+
+def bump_group(group_id, delta):
+    if group_id is None:
+        return
+    Group = global_apps.get_model('posts', 'Group')
+    _bump(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def bump_post_comments(post_id, delta):
+    Post = global_apps.get_model('posts', 'Post')
+    _bump(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _repair(queryset, fields):
+    """Пересчитывает поля fields и сохраняет только разошедшиеся строки."""
+    model = queryset.model
+    annotations = {f'actual_{field}': expr for field, expr in fields.items()}
+    rows = queryset.order_by().annotate(**annotations).values(
+        'pk', *fields, *annotations
+    )
+    drifted = []
+    for row in rows.iterator():
+        changes = {
+            field: row[f'actual_{field}']
+            for field in fields
+            if row[field] != row[f'actual_{field}']
+        }
+        if changes:
+            drifted.append((row['pk'], changes))
+    for pk, changes in drifted:
+        model.objects.filter(pk=pk).update(**changes)
+    return len(drifted)
+
+
+def recount_all(apps=global_apps):
+    """Пересчитывает все счётчики; возвращает число исправленных строк."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    )
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in missing.iterator()],
+        batch_size=500,
+    )
+    return {
+        'groups': _repair(
+            Group.objects.all(),
+            {'posts_count': _count_of(Post, 'group')},
+        ),
+        'posts': _repair(
+            Post.objects.all(),
+            {'comments_count': _count_of(Comment, 'post')},
+        ),
+        'users': _repair(
+            UserStats.objects.all(),
+            {
+                'posts_count': _count_of_user(Post, 'author'),
+                'followers_count': _count_of_user(Follow, 'author'),
+                'following_count': _count_of_user(Follow, 'user'),
+            },
+        ),
+    }
+
+
+def _count_of_user(model, field):
+    # У UserStats первичный ключ совпадает с id пользователя.
+    return _count_of(model, f'{field}_id')
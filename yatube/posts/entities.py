@@ -0,0 +1,110 @@
+"""
+Кэш сущностей по естественному ключу: группа по slug, автор по username.
+
+Поиск идёт сначала в кэш (для нескольких ключей — одним get_many), а
+промахи одним запросом дочитываются из БД и кладутся в кэш. Отсутствие
+строки тоже кэшируется, но ненадолго: несуществующие адреса не доходят
+до БД. Сохранение и удаление строки сбрасывают её записи, в том числе по
+прежнему ключу — он запоминается в кэше рядом с записью. Внутри
+транзакции записи сбрасываются ещё раз после фиксации: читатель мог
+успеть закэшировать старую строку до неё.
+
+Часто меняющиеся счётчики в кэш не попадают: такие поля отложены и
+при обращении читаются из БД.
+
+Кэш общий, без локального уровня процесса: сброс сразу виден всем
+воркерам, а каждый вызов получает свою копию сущности, и то, что запрос
+к ней привязал (например, user.stats), не видят другие.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.http import Http404
+
+from .models import Group
+
+KEY_PREFIX = 'entity'
+MISSING = 'missing'
+
+
+def _cache():
+    return caches['shared']
+
+
+class EntityCache:
+    def __init__(self, name, field, get_queryset):
+        self.name = name
+        self.field = field
+        self.get_queryset = get_queryset
+
+    def _key(self, value):
+        return f'{KEY_PREFIX}:{self.name}:{value}'
+
+    def _pk_key(self, pk):
+        return f'{KEY_PREFIX}:{self.name}-pk:{pk}'
+
+    def get_many(self, values):
+        """Сущности по ключам; ненайденных в результате нет."""
+        keys = {self._key(value): value for value in values}
+        cached = _cache().get_many(list(keys))
+        found = {}
+        missing = []
+        for key, value in keys.items():
+            if key not in cached:
+                missing.append(value)
+            elif cached[key] != MISSING:
+                found[value] = cached[key]
+        if not missing:
+            return found
+        loaded = {
+            getattr(instance, self.field): instance
+            for instance in self.get_queryset().filter(
+                **{f'{self.field}__in': missing}
+            )
+        }
+        _cache().set_many(
+            {self._key(value): MISSING for value in missing
+             if value not in loaded},
+            settings.ENTITY_CACHE_MISSING_SECONDS,
+        )
+        entries = {}
+        for value, instance in loaded.items():
+            entries[self._key(value)] = instance
+            entries[self._pk_key(instance.pk)] = value
+        _cache().set_many(entries, settings.ENTITY_CACHE_SECONDS)
+        found.update(loaded)
+        return found
+
+    def get(self, value):
+        return self.get_many([value]).get(value)
+
+    def get_or_404(self, value):
+        instance = self.get(value)
+        if instance is None:
+            raise Http404(f'{self.name} {value} не найден')
+        return instance
+
+    def _delete(self, value, pk):
+        keys = [self._key(value)]
+        previous = _cache().get(self._pk_key(pk))
+        if previous is not None:
+            keys += [self._key(previous), self._pk_key(pk)]
+        _cache().delete_many(keys)
+
+    def invalidate(self, instance):
+        value, pk = getattr(instance, self.field), instance.pk
+        self._delete(value, pk)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._delete(value, pk))
+
+
+groups = EntityCache(
+    'group', 'slug', lambda: Group.objects.defer('posts_count'),
+)
+users = EntityCache(
+    'user', 'username',
+    lambda: get_user_model().objects.only(
+        'username', 'first_name', 'last_name',
+    ),
+)
@@ -0,0 +1,137 @@
+"""
+Материализованная лента подписок (fan-out on write).
+
+При публикации id поста раскладывается в ленты подписчиков автора, а
+follow_index читает готовые id вместо join через Follow. Авторы с числом
+подписчиков больше FEED_FANOUT_MAX_FOLLOWERS не раскладываются: их посты
+подмешиваются в ленту при чтении (гибридный режим).
+"""
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import FeedEntry, Follow, Post, UserStats
+
+# Лента подрезается, когда выросла больше лимита на эту долю.
+TRIM_SLACK = 1.25
+
+
+def fanout_enabled():
+    return settings.FEED_FANOUT
+
+
+def is_heavy_author(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def heavy_authors(user):
+    """Авторы из подписок пользователя, которые не раскладываются."""
+    return UserStats.objects.filter(
+        user__following__user=user,
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).values('user')
+
+
+def trim_timeline(user_id):
+    size = settings.FEED_TIMELINE_SIZE
+    oldest_kept = (
+        FeedEntry.objects
+        .filter(user_id=user_id)
+        .order_by('-pub_date')
+        .values_list('pub_date', flat=True)[size - 1:size]
+    )
+    cutoff = list(oldest_kept)
+    if cutoff:
+        FeedEntry.objects.filter(
+            user_id=user_id,
+            pub_date__lt=cutoff[0],
+        ).delete()
+
+
+def trim_overflowing(user_ids):
+    limit = int(settings.FEED_TIMELINE_SIZE * TRIM_SLACK)
+    overflowing = (
+        FeedEntry.objects
+        .filter(user_id__in=user_ids)
+        .values('user')
+        .annotate(entries=Count('id'))
+        .filter(entries__gt=limit)
+        .values_list('user', flat=True)
+    )
+    for user_id in overflowing:
+        trim_timeline(user_id)
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты всех подписчиков автора."""
+    if is_heavy_author(post.author_id):
+        return
+    follower_ids = list(
+        Follow.objects
+        .filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+    )
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in follower_ids
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    trim_overflowing(follower_ids)
+
+
+def backfill(user_id, author_id):
+    """Докладывает последние посты автора в ленту нового подписчика."""
+    if is_heavy_author(author_id):
+        return
+    recent = (
+        Post.objects
+        .filter(author_id=author_id)
+        .order_by('-pub_date')
+        .values_list('pk', 'pub_date')[:settings.FEED_TIMELINE_SIZE]
+    )
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in recent
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    trim_timeline(user_id)
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    FeedEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+
+
+def rebuild(user_id):
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    author_ids = Follow.objects.filter(
+        user_id=user_id
+    ).values_list('author_id', flat=True)
+    for author_id in author_ids:
+        backfill(user_id, author_id)
+
+
+def follow_feed(user):
+    """Queryset ленты подписок пользователя."""
+    if not fanout_enabled():
+        return Post.objects.filter(author__following__user=user)
+    timeline = (
+        FeedEntry.objects
+        .filter(user=user)
+        .order_by('-pub_date')
+        .values('post_id')[:settings.FEED_TIMELINE_SIZE]
+    )
+    return Post.objects.filter(
+        Q(pk__in=timeline) | Q(author__in=heavy_authors(user))
+    )
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import check_upload, clean_upload
 from .models import Comment, Post
 
 
@@ -18,6 +20,34 @@ class PostForm(forms.ModelForm):
             'image': 'Загрузите изображение для Вашего нового поста',
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Обрезанный по лимиту файл не отдаём Pillow: ошибка о размере
+        # добавляется в clean().
+        self.oversized = None
+        name = self.add_prefix('image')
+        upload = self.files.get(name)
+        if getattr(upload, 'oversized', False):
+            self.oversized = upload
+            self.files = self.files.copy()
+            del self.files[name]
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        check_upload(image)
+        return clean_upload(image)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.oversized is not None:
+            try:
+                check_upload(self.oversized)
+            except forms.ValidationError as error:
+                self.add_error('image', error)
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,116 @@
+"""
+Проверка и перекодирование загруженных картинок постов.
+
+Проверка читает только заголовок файла: формат и размеры известны без
+декодирования пикселей. Перекодирование, которое убирает EXIF и прочие
+метаданные, декодирует картинку целиком и поэтому выполняется в пуле
+процессов; поток запроса только ждёт результат.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from PIL import Image, ImageOps
+
+from core.pool import get_executor
+
+OFF = 'off'
+INLINE = 'inline'
+POOL = 'pool'
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+
+
+def check_upload(upload):
+    """Проверяет размер файла, формат и размеры картинки."""
+    limit = settings.FILE_UPLOAD_MAX_SIZE
+    if getattr(upload, 'oversized', False) or upload.size > limit:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.',
+            code='too_large',
+            params={'limit': limit // 2 ** 20},
+        )
+    # ImageField уже открыл картинку: формат и размеры взяты из заголовка.
+    image = upload.image
+    if image.format not in ALLOWED_FORMATS:
+        raise ValidationError(
+            'Формат %(format)s не поддерживается.',
+            code='invalid_format',
+            params={'format': image.format},
+        )
+    width, height = image.size
+    if (
+        max(width, height) > settings.IMAGE_MAX_SIDE
+        or width * height > settings.IMAGE_MAX_PIXELS
+    ):
+        raise ValidationError(
+            'Картинка слишком большая: %(width)d×%(height)d.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height},
+        )
+
+
+def reencode(source, target, image_format):
+    """Пересохраняет картинку без метаданных; выполняется в пуле."""
+    with Image.open(source) as image:
+        if getattr(image, 'is_animated', False):
+            image.save(target, format=image_format, save_all=True)
+            return
+        image = ImageOps.exif_transpose(image)
+        options = {'quality': 90} if image_format == 'JPEG' else {}
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(target, format=image_format, **options)
+
+
+def clean_upload(upload):
+    """
+    Заменяет содержимое загрузки картинкой, пересохранённой без
+    метаданных. Результат тоже лежит во временном файле на диске.
+    """
+    mode = settings.IMAGE_REENCODE
+    if mode == OFF:
+        return upload
+    image_format = upload.image.format
+    cleaned = _temporary_file(upload)
+    with _spooled(upload) as source:
+        try:
+            if mode == INLINE:
+                reencode(source, cleaned.name, image_format)
+            else:
+                get_executor().submit(
+                    reencode, source, cleaned.name, image_format
+                ).result(timeout=settings.IMAGE_REENCODE_TIMEOUT)
+        except Exception:
+            cleaned.close()
+            raise ValidationError(
+                'Не удалось обработать изображение.', code='invalid_image'
+            )
+    # Исходный временный файл удаляется вместе с последней ссылкой на
+    # него, новый закроет запрос вместе с остальными загрузками.
+    upload.file = cleaned
+    upload.size = os.path.getsize(cleaned.name)
+    return upload
+
+
+def _temporary_file(upload):
+    suffix = '.upload' + os.path.splitext(upload.name)[1]
+    return tempfile.NamedTemporaryFile(
+        suffix=suffix, dir=settings.FILE_UPLOAD_TEMP_DIR
+    )
+
+
+@contextmanager
+def _spooled(upload):
+    """Путь к содержимому загрузки на диске."""
+    if hasattr(upload, 'temporary_file_path'):
+        yield upload.temporary_file_path()
+        return
+    with _temporary_file(upload) as spooled:
+        upload.seek(0)
+        for chunk in upload.chunks():
+            spooled.write(chunk)
+        spooled.flush()
+        yield spooled.name
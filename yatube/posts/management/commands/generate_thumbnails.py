@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры картинок всех постов во всех размерах.'
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list('image', flat=True)
+        generated = 0
+        for name in names.iterator():
+            generate(name)
+            generated += 1
+        self.stdout.write(f'Обработано картинок: {generated}')
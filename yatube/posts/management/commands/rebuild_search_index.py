@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Переиндексирует все посты для полнотекстового поиска.'
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(Post.objects.all())
+        self.stdout.write(f'Проиндексировано постов: {indexed}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount_all
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики и чинит расхождения.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            repaired = recount_all()
+        for name, count in repaired.items():
+            self.stdout.write(f'{name}: исправлено строк {count}')
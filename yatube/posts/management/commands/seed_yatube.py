@@ -0,0 +1,99 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import feed, thumbnails
+from posts.counters import recount_all
+from posts.models import Follow, Post
+from posts.search import rebuild_index
+from posts.seeding import seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетический набор данных: пользователей, группы, '
+        'посты, комментарии и подписки со степенным распределением.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument(
+            '--users', type=int,
+            help='По умолчанию один пользователь на 20 постов.',
+        )
+        parser.add_argument(
+            '--groups', type=int,
+            help='По умолчанию одна группа на 2000 постов.',
+        )
+        parser.add_argument(
+            '--comments', type=float, default=0.5,
+            help='Среднее число комментариев на пост.',
+        )
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок пользователя.',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой.',
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель степенного закона активности.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--password',
+            help='Пароль всех пользователей; по умолчанию вход невозможен.',
+        )
+        parser.add_argument(
+            '--no-search', action='store_true',
+            help='Не строить поисковый индекс.',
+        )
+        parser.add_argument(
+            '--no-thumbnails', action='store_true',
+            help='Не строить миниатюры картинок заранее.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        seed(
+            posts=options['posts'],
+            users=options['users'],
+            groups=options['groups'],
+            comments=options['comments'],
+            follows=options['follows'],
+            images=options['images'],
+            skew=options['skew'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            password=options['password'],
+            stdout=self.stdout,
+        )
+        with transaction.atomic():
+            recount_all()
+        self.stdout.write('Счётчики пересчитаны')
+        if not options['no_search']:
+            indexed = rebuild_index(Post.objects.all())
+            self.stdout.write(f'Проиндексировано постов: {indexed}')
+        if (not options['no_thumbnails']
+                and thumbnails.mode() != thumbnails.OFF):
+            # bulk_create не вызывает сигналы: миниатюры строятся здесь,
+            # по одному разу на картинку из общего набора.
+            names = Post.objects.exclude(image='').order_by().values_list(
+                'image', flat=True
+            ).distinct()
+            for name in names:
+                thumbnails.generate(name)
+            self.stdout.write(f'Построены миниатюры картинок: {len(names)}')
+        if feed.fanout_enabled():
+            users = Follow.objects.values_list('user', flat=True).distinct()
+            for user_id in users.iterator():
+                feed.rebuild(user_id)
+            self.stdout.write('Ленты подписок пересобраны')
+        # Закэшированные страницы не знают о строках из bulk_create.
+        cache.clear()
+        self.stdout.write(f'Готово за {time.monotonic() - started:.1f} с')
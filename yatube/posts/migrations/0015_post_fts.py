@@ -0,0 +1,51 @@
+from django.db import migrations
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from posts.search import FTS_TABLE, terms
+
+    Post = apps.get_model('posts', 'Post')
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(terms)'
+    )
+    for post in Post.objects.only('text').iterator():
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, terms) VALUES (%s, %s)',
+            [post.pk, ' '.join(terms(post.text).elements())],
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from posts.search import FTS_TABLE
+
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def fill_search_terms(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        return
+    from posts.search import terms
+
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    for post in Post.objects.only('text').iterator():
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, post_id=post.pk, frequency=frequency)
+            for term, frequency in terms(post.text).items()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_searchterm'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.RunPython(fill_search_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,252 @@
+"""
+Полнотекстовый поиск по постам.
+
+Текст разбивается на слова и приводится к основам стеммером Портера для
+русского языка. На SQLite основы хранятся в виртуальной таблице FTS5 и
+ранжируются bm25; на других СУБД используется инвертированный индекс
+SearchTerm (основа, пост, частота) с ранжированием tf-idf. Индекс
+обновляется сигналами при сохранении и удалении поста, выдача
+постранично отдаётся по курсору (ранг, id).
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+
+from .models import Post, SearchTerm
+from .utils import CursorPage, decode_token, encode_token
+
+FTS_TABLE = 'posts_post_fts'
+MAX_QUERY_TERMS = 10
+MAX_TERM_LENGTH = SearchTerm._meta.get_field('term').max_length
+
+WORD = re.compile(r'\w+')
+
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|((?<=[ая])(ла|на|ете|йте|'
+    r'ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_SUFFIX = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+I_SUFFIX = re.compile(r'и$')
+SOFT_SIGN = re.compile(r'ь$')
+DOUBLE_N = re.compile(r'нн$')
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """Основа слова по алгоритму Портера для русского языка."""
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if not match:
+        return word
+    prefix, rv = match.groups()
+    stripped = PERFECTIVE_GERUND.sub('', rv, 1)
+    if stripped == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        stripped = ADJECTIVE.sub('', rv, 1)
+        if stripped != rv:
+            rv = PARTICIPLE.sub('', stripped, 1)
+        else:
+            stripped = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if stripped == rv else stripped
+    else:
+        rv = stripped
+    rv = I_SUFFIX.sub('', rv, 1)
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_SUFFIX.sub('', rv, 1)
+    stripped = SOFT_SIGN.sub('', rv, 1)
+    if stripped == rv:
+        rv = DOUBLE_N.sub('н', SUPERLATIVE.sub('', rv, 1), 1)
+    else:
+        rv = stripped
+    return prefix + rv
+
+
+def terms(text):
+    """Основы слов текста (без однобуквенных) с их частотами."""
+    return Counter(
+        stem(word)[:MAX_TERM_LENGTH]
+        for word in WORD.findall(text.lower())
+        if len(word) > 1
+    )
+
+
+class Fts5Backend:
+    """Индекс в таблице FTS5: строка — основы слов поста, rowid — id."""
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, terms) '
+                'VALUES (%s, %s)',
+                [post.pk, ' '.join(terms(post.text).elements())],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+    def search(self, query_terms, after, limit):
+        match = ' '.join(
+            '"{}"'.format(term.replace('"', '""')) for term in query_terms
+        )
+        sql = (
+            f'SELECT rowid, bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s'
+        )
+        params = [match]
+        if after is not None:
+            # bm25 тем меньше, чем релевантнее пост.
+            sql += (
+                f' AND (bm25({FTS_TABLE}) > %s OR '
+                f'(bm25({FTS_TABLE}) = %s AND rowid > %s))'
+            )
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY score, rowid LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class InvertedIndexBackend:
+    """Индекс в таблице SearchTerm с ранжированием tf-idf."""
+
+    def index(self, post):
+        SearchTerm.objects.filter(post=post).delete()
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, post=post, frequency=frequency)
+            for term, frequency in terms(post.text).items()
+        )
+
+    def remove(self, post_id):
+        SearchTerm.objects.filter(post_id=post_id).delete()
+
+    def search(self, query_terms, after, limit):
+        postings = dict(
+            SearchTerm.objects
+            .filter(term__in=query_terms)
+            .values('term')
+            .annotate(documents=Count('id'))
+            .values_list('term', 'documents')
+        )
+        if len(postings) < len(query_terms):
+            return []
+        # Максимальный id вместо COUNT(*) — оценка числа документов для idf.
+        total = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 1
+        weight = Case(
+            *(
+                When(term=term, then=Value(math.log(1 + total / documents)))
+                for term, documents in postings.items()
+            ),
+            output_field=FloatField(),
+        )
+        # Ранг отрицательный, чтобы порядок совпадал с bm25 в FTS5.
+        rows = (
+            SearchTerm.objects
+            .filter(term__in=query_terms)
+            .values('post')
+            .annotate(
+                score=-Sum(weight * F('frequency'), output_field=FloatField()),
+                matched=Count('term'),
+            )
+            .filter(matched=len(query_terms))
+        )
+        if after is not None:
+            rows = rows.filter(
+                Q(score__gt=after[0]) | Q(score=after[0], post__gt=after[1])
+            )
+        rows = rows.order_by('score', 'post')[:limit]
+        return [(row['post'], row['score']) for row in rows]
+
+
+def fts5_available():
+    if connection.vendor != 'sqlite':
+        return False
+    return _fts5_table_exists(connection.settings_dict['NAME'])
+
+
+@lru_cache(maxsize=None)
+def _fts5_table_exists(database_name):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def get_backend():
+    name = settings.SEARCH_BACKEND
+    if name == 'auto':
+        name = 'fts5' if fts5_available() else 'inverted'
+    return Fts5Backend() if name == 'fts5' else InvertedIndexBackend()
+
+
+def index_post(post):
+    get_backend().index(post)
+
+
+def remove_post(post_id):
+    get_backend().remove(post_id)
+
+
+def rebuild_index(posts):
+    backend = get_backend()
+    indexed = 0
+    with transaction.atomic():
+        for post in posts.only('text').iterator():
+            backend.index(post)
+            indexed += 1
+    return indexed
+
+
+def search_posts(query, cursor=None, per_page=None):
+    """Страница результатов поиска, упорядоченная по релевантности."""
+    per_page = per_page or settings.AMOUNT
+    query_terms = sorted(set(terms(query)))[:MAX_QUERY_TERMS]
+    if not query_terms:
+        return CursorPage([], None, None, None)
+    after = decode_token(cursor) if cursor else None
+    if not (
+        isinstance(after, list)
+        and len(after) == 2
+        and isinstance(after[0], (int, float))
+        and isinstance(after[1], int)
+    ):
+        after = None
+    rows = get_backend().search(query_terms, after, per_page + 1)
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    posts = Post.objects.for_feed().in_bulk([post_id for post_id, _ in rows])
+    found = [posts[post_id] for post_id, _ in rows if post_id in posts]
+    next_cursor = None
+    if has_next:
+        last_id, last_score = rows[-1]
+        next_cursor = encode_token([last_score, last_id])
+    return CursorPage(found, None, next_cursor, None)
@@ -0,0 +1,270 @@
+"""
+Генерация больших синтетических наборов данных.
+
+Объём активности распределён по степенному закону: немногие авторы пишут
+большую часть постов и собирают большую часть подписчиков, комментарии
+чаще достаются свежим постам. Строки создаются генераторами и пишутся
+пачками через bulk_create, поэтому память не растёт с объёмом. Сигналы
+при bulk_create не срабатывают: счётчики, поисковый индекс и ленты
+пересобираются после загрузки. Даты постов и комментариев задаются
+генератором: auto_now и auto_now_add на время загрузки выключены.
+"""
+import os
+import random
+from array import array
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+TEXT_POOL_SIZE = 2000
+IMAGE_POOL_SIZE = 20
+IMAGE_DIR = 'posts/seed'
+
+
+class PowerLaw:
+    """Выбор индекса 0..n-1 с весом 1 / (rank + 1) ** skew."""
+
+    def __init__(self, rng, size, skew):
+        self.rng = rng
+        self.cum_weights = list(
+            accumulate(1 / (rank + 1) ** skew for rank in range(size))
+        )
+        self.total = self.cum_weights[-1]
+
+    def __call__(self):
+        return bisect(self.cum_weights, self.rng.random() * self.total)
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@contextmanager
+def bulk_load():
+    """
+    Ускоряет загрузку: без проверок внешних ключей и, в SQLite, без
+    fsync на каждую транзакцию (режим нельзя менять внутри транзакции).
+    """
+    sqlite = (
+        connection.vendor == 'sqlite' and not connection.in_atomic_block
+    )
+    if sqlite:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+            cursor.execute('PRAGMA synchronous = OFF')
+    try:
+        with connection.constraint_checks_disabled():
+            yield
+    finally:
+        if sqlite:
+            with connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA synchronous = {int(synchronous)}')
+
+
+@contextmanager
+def explicit_dates(*models):
+    """Сохраняет даты строк как есть вместо текущего времени."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Seeder:
+    def __init__(self, posts, users=None, groups=None, comments=0.5,
+                 follows=20, images=0.0, skew=1.1, seed=0, batch_size=2000,
+                 password=None, stdout=None):
+        self.posts = posts
+        self.users = users or max(10, posts // 20)
+        self.groups = groups or max(3, posts // 2000)
+        self.comments = int(posts * comments)
+        self.follows = follows
+        self.images = images
+        self.skew = skew
+        self.batch_size = batch_size
+        self.password = (
+            make_password(password) if password else make_password(None)
+        )
+        self.rng = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.stdout = stdout
+        self.texts = [
+            self.fake.sentence(nb_words=12) for _ in range(TEXT_POOL_SIZE)
+        ]
+        # Посты идут по минуте до текущего момента, как при настоящей
+        # публикации.
+        self.start = timezone.now() - timedelta(minutes=self.posts)
+
+    def pub_date(self, index):
+        return self.start + timedelta(minutes=index)
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def text(self, sentences):
+        return ' '.join(
+            self.rng.choice(self.texts)
+            for _ in range(self.rng.randint(1, sentences))
+        )
+
+    def insert(self, model, rows, **kwargs):
+        created = 0
+        for batch in batched(rows, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **kwargs)
+            created += len(batch)
+        self.log(f'{model.__name__}: {created}')
+        return created
+
+    def next_id(self, model):
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def created_ids(self, model, rows):
+        """
+        Создаёт строки и возвращает их id по возрастанию. Новые id больше
+        прежних, но подряд идти не обязаны: SQLite с AUTOINCREMENT не
+        переиспользует id удалённых строк, поэтому они читаются из базы.
+        """
+        last = self.next_id(model) - 1
+        self.insert(model, rows)
+        return array('q', model.objects.filter(pk__gt=last).order_by('pk')
+                     .values_list('pk', flat=True).iterator())
+
+    def user_rows(self, start):
+        for index in range(start, start + self.users):
+            yield User(
+                username=f'{self.fake.user_name()}{index}'[:150],
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=self.password,
+            )
+
+    def group_rows(self, start):
+        for index in range(start, start + self.groups):
+            yield Group(
+                title=f'{self.fake.word().capitalize()} {index}'[:200],
+                slug=f'group-{index}',
+                description=self.text(3),
+            )
+
+    def image_names(self):
+        if not self.images:
+            return []
+        names = []
+        for index in range(IMAGE_POOL_SIZE):
+            buffer = BytesIO()
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            Image.new('RGB', (960, 540), color).save(buffer, 'JPEG')
+            name = os.path.join(IMAGE_DIR, f'seed-{index}.jpg')
+            if not default_storage.exists(name):
+                default_storage.save(name, buffer)
+            names.append(name)
+        return names
+
+    def post_rows(self, user_ids, group_ids, images):
+        author = PowerLaw(self.rng, len(user_ids), self.skew)
+        group = PowerLaw(self.rng, len(group_ids), self.skew)
+        for index in range(self.posts):
+            pub_date = self.pub_date(index)
+            yield Post(
+                text=self.text(8),
+                author_id=user_ids[author()],
+                group_id=(
+                    group_ids[group()] if self.rng.random() < 0.6 else None
+                ),
+                image=(
+                    self.rng.choice(images)
+                    if images and self.rng.random() < self.images else ''
+                ),
+                pub_date=pub_date,
+                updated=pub_date,
+            )
+
+    def comment_rows(self, user_ids, post_ids):
+        commenter = PowerLaw(self.rng, len(user_ids), self.skew)
+        for _ in range(self.comments):
+            # Свежие посты комментируют чаще.
+            offset = int(len(post_ids) * self.rng.random() ** 3)
+            index = len(post_ids) - 1 - offset
+            yield Comment(
+                post_id=post_ids[index],
+                author_id=user_ids[commenter()],
+                text=self.text(2),
+                created=self.pub_date(index) + timedelta(
+                    minutes=self.rng.random() * (offset + 1)
+                ),
+            )
+
+    def follow_rows(self, user_ids):
+        # Популярные авторы собирают больше подписчиков.
+        popular = PowerLaw(self.rng, len(user_ids), self.skew)
+        for user_id in user_ids:
+            count = min(
+                len(user_ids) - 1,
+                int(self.rng.paretovariate(1.5) * self.follows / 3),
+            )
+            authors = {user_ids[popular()] for _ in range(count)}
+            authors.discard(user_id)
+            for author_id in authors:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    def run(self):
+        with bulk_load(), explicit_dates(Post, Comment):
+            user_ids = self.created_ids(
+                User, self.user_rows(self.next_id(User))
+            )
+            group_ids = self.created_ids(
+                Group, self.group_rows(self.next_id(Group))
+            )
+            post_ids = self.created_ids(
+                Post,
+                self.post_rows(user_ids, group_ids, self.image_names()),
+            )
+            self.insert(Comment, self.comment_rows(user_ids, post_ids))
+            self.insert(
+                Follow, self.follow_rows(user_ids), ignore_conflicts=True,
+            )
+        return {
+            'users': user_ids,
+            'groups': group_ids,
+            'posts': post_ids,
+        }
+
+
+def seed(**options):
+    """Загружает набор данных; возвращает id созданных строк."""
+    return Seeder(**options).run()
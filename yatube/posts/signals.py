@@ -0,0 +1,171 @@
+from django.contrib.auth import get_user_model
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache_versions, counters, entities, feed, search, thumbnails
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+# Поля, которые выводятся на страницах с постами пользователя и группы.
+USER_DISPLAY_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_DISPLAY_FIELDS = ('title', 'slug', 'description')
+
+
+def _display_changed(instance, fields, update_fields):
+    if instance._state.adding or instance.pk is None:
+        return False
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return False
+    stored = type(instance)._base_manager.filter(pk=instance.pk).values(
+        *fields
+    ).first()
+    return stored is not None and any(
+        stored[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Group)
+def remember_display_change(sender, instance, raw, update_fields, **kwargs):
+    if raw:
+        return
+    fields = USER_DISPLAY_FIELDS if sender is User else GROUP_DISPLAY_FIELDS
+    instance._display_changed = _display_changed(
+        instance, fields, update_fields
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw, update_fields, **kwargs):
+    if raw:
+        return
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    elif getattr(instance, '_display_changed', False):
+        # Подпись автора выводится в карточках его постов во всех лентах.
+        group_ids = instance.posts.exclude(group=None).order_by().values_list(
+            'group_id', flat=True
+        ).distinct()
+        cache_versions.bump(cache_versions.author_card_scope(instance.pk))
+        cache_versions.bump_post(instance.pk, *group_ids)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, update_fields, **kwargs):
+    if raw:
+        return
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+    if update_fields is None or 'image' in update_fields:
+        thumbnails.schedule(instance)
+    group_ids = [instance.group_id]
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        counters.bump_group(instance.group_id, 1)
+        if feed.fanout_enabled():
+            feed.fan_out(instance)
+    else:
+        loaded_group_id = getattr(instance, '_loaded_group_id', DEFERRED)
+        if (
+            loaded_group_id is not DEFERRED
+            and loaded_group_id != instance.group_id
+        ):
+            counters.bump_group(loaded_group_id, -1)
+            counters.bump_group(instance.group_id, 1)
+            group_ids.append(loaded_group_id)
+    instance._loaded_group_id = instance.group_id
+    cache_versions.bump_post(instance.author_id, *group_ids)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.bump_group(instance.group_id, -1)
+    cache_versions.bump_post(instance.author_id, instance.group_id)
+
+
+def comments_changed(post_id, delta):
+    counters.bump_post_comments(post_id, delta)
+    # Карточка поста в лентах показывает число комментариев.
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'group_id'
+    ).first()
+    if post:
+        cache_versions.bump_post(post['author_id'], post['group_id'])
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        comments_changed(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    comments_changed(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        group_changed(sender, instance)
+        return
+    if not getattr(instance, '_display_changed', False):
+        return
+    # Ссылка на группу выводится в карточках её постов, в том числе в
+    # профилях их авторов.
+    cache_versions.bump(
+        cache_versions.group_card_scope(instance.pk),
+        *(
+            cache_versions.author_scope(author_id)
+            for author_id in instance.posts.order_by().values_list(
+                'author_id', flat=True
+            ).distinct()
+        ),
+    )
+    group_changed(sender, instance)
+
+
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    cache_versions.bump(
+        cache_versions.FEED,
+        cache_versions.group_scope(instance.pk),
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw, **kwargs):
+    if not created or raw:
+        return
+    counters.bump_user(instance.author_id, 'followers_count', 1)
+    counters.bump_user(instance.user_id, 'following_count', 1)
+    if feed.fanout_enabled():
+        feed.backfill(instance.user_id, instance.author_id)
+    cache_versions.bump(cache_versions.follows_scope(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+    counters.bump_user(instance.user_id, 'following_count', -1)
+    if feed.fanout_enabled():
+        feed.prune(instance.user_id, instance.author_id)
+    cache_versions.bump(cache_versions.follows_scope(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_entity_changed(sender, instance, **kwargs):
+    entities.users.invalidate(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_entity_changed(sender, instance, **kwargs):
+    entities.groups.invalidate(instance)
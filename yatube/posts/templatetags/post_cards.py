@@ -0,0 +1,54 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from ..cache_versions import author_card_scope, group_card_scope, versions
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_list.html'
+
+
+def _card_scopes(post):
+    scopes = [author_card_scope(post.author_id)]
+    if post.group_id:
+        scopes.append(group_card_scope(post.group_id))
+    return scopes
+
+
+def card_key(post, card_versions):
+    # comments_count не двигает updated, поэтому тоже входит в ключ, а
+    # подпись автора и ссылка на группу — через версии их карточек.
+    scoped = '.'.join(
+        str(card_versions[scope]) for scope in _card_scopes(post)
+    )
+    return (
+        f'post-card:{post.pk}:{post.updated.timestamp()}:'
+        f'{post.comments_count}:{scoped}'
+    )
+
+
+@register.simple_tag
+def post_cards(posts):
+    """
+    Отрендеренные карточки постов ленты: все фрагменты страницы достаются
+    из кэша одним get_many, шаблон рендерится только для промахов.
+    """
+    posts = list(posts)
+    scopes = list(dict.fromkeys(
+        scope for post in posts for scope in _card_scopes(post)
+    ))
+    card_versions = dict(zip(scopes, versions(*scopes)))
+    keys = [card_key(post, card_versions) for post in posts]
+    cards = cache.get_many(keys)
+    missed = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in zip(keys, posts)
+        if key not in cards
+    }
+    if missed:
+        cache.set_many(missed, timeout=settings.POST_CARD_CACHE_TTL)
+        cards.update(missed)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,13 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(image, preset):
+    """
+    Готовая миниатюра картинки поста или None, пока пул её не построил.
+    """
+    return thumbnails.ready_thumbnail(image, preset)
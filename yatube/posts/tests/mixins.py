@@ -0,0 +1,50 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверка, что страница укладывается в фиксированный бюджет запросов."""
+
+    def assertQueryBudget(self, client, url, budget):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        executed = len(context.captured_queries)
+        self.assertLessEqual(
+            executed,
+            budget,
+            f'{url}: {executed} запросов при бюджете {budget}:\n'
+            + '\n'.join(query['sql'] for query in context.captured_queries)
+        )
+        return response
+
+
+class QueryPlanMixin:
+    """
+    Проверка планов запросов страницы: ни одна таблица не читается
+    полным сканированием, и сортировка не строится во временном B-дереве.
+    """
+
+    def query_plans(self, client, url):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plans.append(
+                    (query['sql'], [row[-1] for row in cursor.fetchall()])
+                )
+        return plans
+
+    def assertIndexedPlans(self, client, url, allow_sort=False):
+        for sql, plan in self.query_plans(client, url):
+            for step in plan:
+                full_scan = step.startswith('SCAN') and 'INDEX' not in step
+                sort = 'TEMP B-TREE' in step and not allow_sort
+                self.assertFalse(
+                    full_scan or sort,
+                    f'{url}: {step}\n{sql}\n' + '\n'.join(plan),
+                )
@@ -0,0 +1,89 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test-author')
+        cls.reader = User.objects.create_user(username='test-reader')
+        cls.group = Group.objects.create(
+            title='test-group',
+            slug='test-slug',
+            description='test-description',
+        )
+        cls.second_group = Group.objects.create(
+            title='second-group',
+            slug='second-slug',
+            description='second-description',
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters_follow_create_move_and_delete(self):
+        """Счётчики постов автора и группы следуют за постом"""
+        post = Post.objects.create(
+            text='test-post',
+            author=self.author,
+            group=self.group,
+        )
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.second_group
+        post.save()
+        self.group.refresh_from_db()
+        self.second_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.second_group.posts_count, 1)
+
+        post.delete()
+        self.second_group.refresh_from_db()
+        self.assertEqual(self.second_group.posts_count, 0)
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_comment_and_follow_counters(self):
+        """Счётчики комментариев и подписок обновляются"""
+        post = Post.objects.create(text='test-post', author=self.author)
+        comment = Comment.objects.create(
+            post=post,
+            author=self.reader,
+            text='test-comment',
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_recount_command_repairs_drift(self):
+        """Команда recount_counters чинит разошедшиеся счётчики"""
+        Post.objects.create(
+            text='test-post',
+            author=self.author,
+            group=self.group,
+        )
+        Group.objects.filter(pk=self.group.pk).update(posts_count=7)
+        UserStats.objects.filter(user=self.author).delete()
+        call_command('recount_counters', stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
@@ -0,0 +1,112 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..entities import groups, users
+from ..models import Group
+
+User = get_user_model()
+
+
+class EntityCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='test-author')
+        cls.first = Group.objects.create(
+            title='first', slug='first', description='-',
+        )
+        cls.second = Group.objects.create(
+            title='second', slug='second', description='-',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_batched_read_through(self):
+        """Промахи дочитываются одним запросом, повтор — из кэша"""
+        with self.assertNumQueries(1):
+            found = groups.get_many(['first', 'second', 'absent'])
+        self.assertEqual(set(found), {'first', 'second'})
+        with self.assertNumQueries(0):
+            self.assertEqual(groups.get('first'), self.first)
+            self.assertIsNone(groups.get('absent'))
+
+    def test_save_and_delete_invalidate(self):
+        """Новые, переименованные и удалённые строки видны сразу"""
+        self.assertIsNone(groups.get('third'))
+        third = Group.objects.create(
+            title='third', slug='third', description='-',
+        )
+        self.assertEqual(groups.get('third'), third)
+        self.first.slug = 'renamed'
+        self.first.save()
+        self.assertIsNone(groups.get('first'))
+        self.assertEqual(groups.get('renamed').pk, self.first.pk)
+        third.delete()
+        self.assertIsNone(groups.get('third'))
+
+    def test_views_skip_entity_queries(self):
+        """Группа и автор на повторном запросе не читаются из БД"""
+        urls = (
+            (reverse('posts:group', args=['second']), 'FROM "posts_group"'),
+            (
+                reverse('posts:profile', args=[self.author.username]),
+                'FROM "auth_user"',
+            ),
+        )
+        for url, lookup in urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertFalse(
+                    [query for query in queries if lookup in query['sql']]
+                )
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:profile', args=['absent'])
+            ).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+        self.assertIsNone(users.get('absent'))
+
+    def test_entities_are_not_shared(self):
+        """Каждый вызов получает свою копию сущности"""
+        self.assertIsNot(users.get('test-author'), users.get('test-author'))
+
+    def test_profile_count_follows_new_posts(self):
+        """Счётчик постов в профиле растёт после публикации"""
+        self.client.force_login(self.author)
+        url = reverse('posts:profile', args=[self.author.username])
+        self.client.post(reverse('posts:post_create'), {'text': 'Первый'})
+        self.assertContains(self.client.get(url), 'Всего постов: 1')
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Второй'}, follow=True,
+        )
+        self.assertContains(response, 'Всего постов: 2')
+
+
+class EntityInvalidateTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidated_again_after_commit(self):
+        """Записи, закэшированные до фиксации, сбрасываются после неё"""
+        group = Group.objects.create(title='old', slug='old', description='-')
+        stale = groups.get('old')
+        with transaction.atomic():
+            group.slug = 'new'
+            group.save()
+            # Читатель до фиксации видит старую строку и кэширует её.
+            cache.set_many({
+                groups._key('old'): stale,
+                groups._pk_key(group.pk): 'old',
+            })
+        self.assertIsNone(groups.get('old'))
+        self.assertEqual(groups.get('new').pk, group.pk)
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..feed import trim_timeline
+from ..models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(FEED_FANOUT=True)
+class FeedFanoutTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test-author')
+        cls.reader = User.objects.create_user(username='test-reader')
+        cls.old_post = Post.objects.create(
+            text='test-old-post',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(FeedFanoutTest.reader)
+
+    def follow_page_posts(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'].object_list)
+
+    def test_follow_backfills_and_new_post_fans_out(self):
+        """Подписка докладывает старые посты, новый пост попадает в ленту"""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user=self.reader, post=self.old_post
+            ).exists()
+        )
+        new_post = Post.objects.create(
+            text='test-new-post',
+            author=self.author,
+        )
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=new_post).exists()
+        )
+        self.assertEqual(self.follow_page_posts(), [new_post, self.old_post])
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.follow_page_posts(), [])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_heavy_author_is_merged_at_read_time(self):
+        """Посты популярного автора не раскладываются, но есть в ленте"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(
+            text='test-new-post',
+            author=self.author,
+        )
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.follow_page_posts(), [new_post, self.old_post])
+
+    @override_settings(FEED_TIMELINE_SIZE=2)
+    def test_timeline_is_bounded(self):
+        """Лента подписок хранит не больше FEED_TIMELINE_SIZE записей"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for index in range(4):
+            Post.objects.create(text=f'test-post-{index}', author=self.author)
+        trim_timeline(self.reader.pk)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(),
+            2,
+        )
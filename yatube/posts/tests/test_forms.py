@@ -1,11 +1,13 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Group, Post
 
@@ -108,3 +110,76 @@ class PostFormTests(TestCase):
                 id=PostFormTests.post.id,
             ).exists(),
         )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_REENCODE='inline')
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+        cls.post = Post.objects.create(text='test-post', author=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def upload(self, size=(40, 30), exif=None):
+        buffer = BytesIO()
+        image = Image.new('RGB', size, color=(200, 10, 10))
+        image.save(buffer, 'JPEG', exif=exif or b'')
+        return SimpleUploadedFile(
+            'photo.jpg', buffer.getvalue(), content_type='image/jpeg'
+        )
+
+    def edit(self, upload):
+        return self.client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            data={'text': 'edited', 'image': upload},
+        )
+
+    def test_metadata_is_stripped(self):
+        """Сохранённая картинка пересохранена без EXIF."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera Maker'
+        self.edit(self.upload(exif=exif.tobytes()))
+        self.post.refresh_from_db()
+        with Image.open(self.post.image.path) as saved:
+            self.assertEqual(saved.size, (40, 30))
+            self.assertNotIn('exif', saved.info)
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=100)
+    def test_oversized_file_is_rejected(self):
+        """Файл больше лимита отклоняется ошибкой формы."""
+        response = self.edit(self.upload())
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 0 МБ.'
+        )
+        self.post.refresh_from_db()
+        self.assertFalse(self.post.image)
+
+    @override_settings(IMAGE_MAX_SIDE=20)
+    def test_too_large_dimensions_are_rejected(self):
+        """Картинка со стороной больше лимита отклоняется без декодирования."""
+        response = self.edit(self.upload())
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка слишком большая: 40×30.'
+        )
+
+    def test_upload_is_spooled_to_disk(self):
+        """Загрузка пишется на диск даже для маленького файла."""
+        response = self.client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            data={'text': 'edited', 'image': self.upload()},
+        )
+        self.assertEqual(response.status_code, 302)
+        handlers = [
+            type(handler).__name__
+            for handler in response.wsgi_request.upload_handlers
+        ]
+        self.assertEqual(handlers, ['LimitedTemporaryFileUploadHandler'])
@@ -0,0 +1,99 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from .mixins import QueryPlanMixin
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class QueryPlanTest(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='test-reader')
+        cls.author = User.objects.create_user(username='test-author')
+        cls.group = Group.objects.create(
+            title='test-group',
+            slug='test-slug',
+            description='test-description',
+        )
+        for index in range(15):
+            cls.post = Post.objects.create(
+                text=f'test-post-{index}',
+                author=cls.author,
+                group=cls.group if index % 2 else None,
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Comment.objects.create(
+            post=cls.post,
+            author=cls.reader,
+            text='test-comment',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(QueryPlanTest.reader)
+
+    def test_listing_views_use_indexes(self):
+        """Ленты группы и профиля читают посты по составным индексам"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertIndexedPlans(self.client, url)
+
+    @override_settings(CURSOR_PAGINATION=True)
+    def test_cursor_listing_views_use_indexes(self):
+        """Курсорные страницы лент не сортируют посты во временном дереве"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertIndexedPlans(self.client, url)
+
+    def test_post_detail_uses_indexes(self):
+        """Комментарии поста читаются по индексу (post, created)"""
+        self.assertIndexedPlans(
+            self.client,
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+
+    def test_follow_index_uses_indexes(self):
+        """Лента подписок находит подписки и посты авторов по индексам"""
+        # Посты нескольких авторов сливаются в одну ленту, поэтому
+        # сортировка слиянием допустима, а полное сканирование — нет.
+        for fanout in (False, True):
+            with self.subTest(fanout=fanout):
+                with override_settings(FEED_FANOUT=fanout):
+                    self.assertIndexedPlans(
+                        self.client,
+                        reverse('posts:follow_index'),
+                        allow_sort=True,
+                    )
+
+    def test_follow_lookups_use_indexes(self):
+        """Подписки ищутся по индексу в обе стороны"""
+        for queryset in (
+            Follow.objects.filter(user=self.reader),
+            Follow.objects.filter(author=self.author),
+        ):
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            with self.subTest(sql=sql):
+                self.assertIn('COVERING INDEX', plan)
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..search import search_posts, stem
+
+User = get_user_model()
+
+
+class StemTest(TestCase):
+    def test_word_forms_share_stem(self):
+        """Формы одного слова приводятся к общей основе"""
+        for forms in (
+            ('кот', 'кота', 'котами'),
+            ('прогулка', 'прогулки', 'прогулкой'),
+            ('бегать', 'бегала', 'бегали'),
+        ):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(word) for word in forms}), 1)
+
+
+class SearchBackendMixin:
+    backend = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.settings_override = override_settings(SEARCH_BACKEND=cls.backend)
+        cls.settings_override.enable()
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.cat_post = Post.objects.create(
+            text='Кот гуляет по крыше, коты любят крыши',
+            author=cls.user,
+        )
+        cls.dog_post = Post.objects.create(
+            text='Собака охраняет двор от кота',
+            author=cls.user,
+        )
+        cls.other_post = Post.objects.create(
+            text='Погода сегодня хорошая',
+            author=cls.user,
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings_override.disable()
+
+    def test_search_matches_word_forms_and_ranks(self):
+        """Поиск находит формы слова, релевантный пост идёт первым"""
+        page = search_posts('котов')
+        self.assertEqual(list(page), [self.cat_post, self.dog_post])
+
+    def test_search_requires_all_terms(self):
+        """Все слова запроса должны встретиться в посте"""
+        self.assertEqual(list(search_posts('кот собака')), [self.dog_post])
+        self.assertEqual(list(search_posts('кот погода')), [])
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при правке и удалении поста"""
+        self.other_post.text = 'Кошки и коты'
+        self.other_post.save()
+        self.assertIn(self.other_post, list(search_posts('кот')))
+        self.other_post.delete()
+        self.assertEqual(len(search_posts('кот')), 2)
+
+    def test_cursor_pagination(self):
+        """Выдача листается по курсору без повторов"""
+        first = search_posts('кот', per_page=1)
+        self.assertTrue(first.has_next())
+        second = search_posts('кот', first.next_cursor, per_page=1)
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            list(first) + list(second),
+            [self.cat_post, self.dog_post],
+        )
+
+    def test_search_page(self):
+        """Страница /search/ показывает найденные посты"""
+        response = self.client.get(reverse('posts:search'), {'q': 'собаки'})
+        self.assertContains(response, 'Собака охраняет двор')
+        self.assertNotContains(response, 'Погода сегодня')
+
+
+class Fts5SearchTest(SearchBackendMixin, TestCase):
+    backend = 'fts5'
+
+
+class InvertedIndexSearchTest(SearchBackendMixin, TestCase):
+    backend = 'inverted'
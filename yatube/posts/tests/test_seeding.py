@@ -0,0 +1,115 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F, Max, Min
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Follow, Group, Post, UserStats
+from ..seeding import seed
+from ..thumbnails import ready_thumbnail
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_yatube',
+            posts=400,
+            users=40,
+            groups=4,
+            images=0.5,
+            stdout=StringIO(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_requested_volume_is_loaded(self):
+        """Команда создаёт заданное число строк каждой модели"""
+        self.assertEqual(Post.objects.count(), 400)
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Group.objects.count(), 4)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+
+    def test_author_activity_is_skewed(self):
+        """Самый активный автор пишет много больше среднего"""
+        top = UserStats.objects.order_by('-posts_count').first()
+        self.assertGreater(top.posts_count, 400 / 40 * 3)
+
+    def test_follow_graph_is_valid(self):
+        """В графе подписок нет подписок на себя"""
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+
+    def test_counters_match_rows(self):
+        """Счётчики пересчитаны после загрузки"""
+        for group in Group.objects.all():
+            self.assertEqual(group.posts_count, group.posts.count())
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)),
+            400,
+        )
+
+    def test_dates_are_spread_out(self):
+        """Посты идут по минуте, комментарии пишутся после постов"""
+        dates = Post.objects.aggregate(first=Min('pub_date'),
+                                       last=Max('pub_date'))
+        self.assertEqual(dates['last'] - dates['first'],
+                         timedelta(minutes=399))
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__pub_date')).exists()
+        )
+        self.assertGreater(
+            Comment.objects.values('created').distinct().count(), 100
+        )
+
+    def test_thumbnails_are_pregenerated(self):
+        """Миниатюры картинок построены при загрузке"""
+        post = Post.objects.exclude(image='').first()
+        for preset in settings.THUMBNAIL_PRESETS:
+            with self.subTest(preset=preset):
+                self.assertIsNotNone(ready_thumbnail(post.image, preset))
+
+    def test_posts_are_searchable(self):
+        """Загруженные посты попадают в поисковый индекс"""
+        word = Post.objects.first().text.split()[0]
+        response = self.client.get('/search/', {'q': word})
+        self.assertTrue(response.context['page_obj'].object_list)
+
+
+class SeederIdsTest(TestCase):
+    def test_ids_after_deleted_rows(self):
+        """После удаления последних строк id созданных читаются из базы"""
+        author = User.objects.create_user(username='gone')
+        group = Group.objects.create(title='Gone', slug='gone')
+        Post.objects.create(author=author, group=group, text='Gone')
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        created = seed(posts=30, users=10, groups=3, comments=0, follows=0)
+        self.assertEqual(list(created['users']), list(
+            User.objects.order_by('pk').values_list('pk', flat=True)
+        ))
+        self.assertEqual(len(created['groups']), 3)
+        self.assertEqual(len(created['posts']), 30)
+        self.assertEqual(
+            Post.objects.filter(author__isnull=False).count(), 30
+        )
+        self.assertFalse(
+            Post.objects.exclude(group_id=None)
+            .exclude(group_id__in=created['groups']).exists()
+        )
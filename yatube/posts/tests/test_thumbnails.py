@@ -0,0 +1,95 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+PLACEHOLDER = 'Изображение обрабатывается'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPregenerationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.user,
+            text='test-text',
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'),
+        )
+
+    @override_settings(THUMBNAIL_PREGENERATE='sync')
+    def test_saved_image_has_ready_thumbnails(self):
+        """Миниатюры всех размеров готовы сразу после сохранения поста."""
+        post = self.create_post('sync.gif')
+        for preset in settings.THUMBNAIL_PRESETS:
+            with self.subTest(preset=preset):
+                self.assertIsNotNone(
+                    thumbnails.ready_thumbnail(post.image, preset)
+                )
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        self.assertContains(response, '<img class="card-img')
+        self.assertNotContains(response, PLACEHOLDER)
+
+    @override_settings(THUMBNAIL_PREGENERATE='async')
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """Пока пул не построил миниатюру, страницы показывают заглушку."""
+        post = self.create_post('async.gif')
+        self.assertIsNone(thumbnails.ready_thumbnail(post.image, 'detail'))
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        self.assertContains(response, PLACEHOLDER)
+        self.assertNotContains(response, '<img class="card-img')
+
+    @override_settings(THUMBNAIL_PREGENERATE='async')
+    def test_lookup_finds_thumbnail_built_by_sorl(self):
+        """Поиск готовой миниатюры совпадает с файлом, который строит sorl."""
+        post = self.create_post('lookup.gif')
+        geometry, options = settings.THUMBNAIL_PRESETS['feed']
+        built = get_thumbnail(post.image, geometry, **options)
+        ready = thumbnails.ready_thumbnail(post.image, 'feed')
+        self.assertEqual(ready.name, built.name)
+
+    @override_settings(THUMBNAIL_PREGENERATE='async')
+    def test_mark_ready_refreshes_post_card(self):
+        """Готовая миниатюра сдвигает updated, и карточка перерисуется."""
+        post = self.create_post('ready.gif')
+        thumbnails.generate(post.image.name)
+        thumbnails.mark_ready(post.pk)
+        post_updated = Post.objects.get(pk=post.pk).updated
+        self.assertGreater(post_updated, post.updated)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<img class="card-img')
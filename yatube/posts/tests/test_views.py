@@ -1,18 +1,27 @@
+import gzip
 import shutil
 import tempfile
+import time
 from http import HTTPStatus
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.test import Client, TestCase, override_settings
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
 from django.urls import reverse
 
-from ..models import Comment, Follow, Group, Post
+from core import page_cache, write_queue
+
+from .. import cache_versions
+from ..models import Comment, Follow, Group, Post, UserStats
 from ..utils import count_elements
+from ..writes import create_comments
+from .mixins import QueryBudgetMixin
 
 User = get_user_model()
 
@@ -245,6 +254,43 @@ class PaginatorViewTest(TestCase):
             posts_count_left
         )
 
+    @override_settings(CURSOR_PAGINATION=True)
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Курсорная пагинация листает ленту вперёд и назад без пропусков"""
+        cache.clear()
+        first_page = self.client.get(
+            reverse('posts:index')
+        ).context['page_obj']
+        self.assertEqual(len(first_page), settings.AMOUNT)
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+
+        second_page = self.client.get(
+            reverse('posts:index'), {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        self.assertEqual(
+            list(first_page) + list(second_page),
+            expected,
+        )
+
+        back_page = self.client.get(
+            reverse('posts:index'), {'cursor': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back_page), list(first_page))
+        self.assertFalse(back_page.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор отдаёт первую страницу"""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'broken'}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), settings.AMOUNT)
+        self.assertFalse(page_obj.has_previous())
+
 
 class CommentViewTest(TestCase):
     @classmethod
@@ -361,11 +407,12 @@ class CacheViewTest(TestCase):
 
     def test_cache_index(self):
         """Проверка хранения и очищения кэша для index."""
+        cache.clear()
         response = CacheViewTest.authorized_client.get(reverse('posts:index'))
         posts = response.content
-        Post.objects.create(
-            text='test-new-post',
-            author=CacheViewTest.author,
+        # Обновление в обход сигналов не сдвигает версию: фрагмент из кэша.
+        Post.objects.filter(pk=CacheViewTest.post.pk).update(
+            text='test-silent-edit'
         )
         response_old = CacheViewTest.authorized_client.get(
             reverse('posts:index')
@@ -383,6 +430,336 @@ class CacheViewTest(TestCase):
         new_posts = response_new.content
         self.assertNotEqual(old_posts, new_posts, 'Нет сброса кэша.')
 
+    def test_post_card_is_shared_between_feeds(self):
+        """Карточка поста из кэша используется всеми лентами до правки."""
+        cache.clear()
+        CacheViewTest.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=CacheViewTest.post.pk).update(
+            text='test-silent-edit'
+        )
+        group_url = reverse('posts:group', args=[CacheViewTest.group.slug])
+        response = CacheViewTest.authorized_client.get(group_url)
+        self.assertContains(response, 'test-post')
+
+        post = Post.objects.get(pk=CacheViewTest.post.pk)
+        post.text = 'test-edited-post'
+        post.save()
+        response = CacheViewTest.authorized_client.get(group_url)
+        self.assertContains(response, 'test-edited-post')
+
+    def test_author_rename_refreshes_cards_only(self):
+        """Переименование автора обновляет карточки, пароль — нет"""
+        cache.clear()
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group', args=[CacheViewTest.group.slug]),
+        )
+        for url in urls:
+            self.client.get(url)
+        updated = Post.objects.get(pk=CacheViewTest.post.pk).updated
+        author = User.objects.get(pk=CacheViewTest.author.pk)
+        author.set_password('another-password')
+        author.save()
+        author.first_name = 'Переименованный'
+        author.save()
+        self.assertEqual(
+            Post.objects.get(pk=CacheViewTest.post.pk).updated, updated
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Переименованный')
+
+    def test_new_post_invalidates_cached_pages(self):
+        """Новый пост сразу сбрасывает кэш главной, группы и профиля."""
+        cache.clear()
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group', args=[CacheViewTest.group.slug]),
+            reverse('posts:profile', args=[CacheViewTest.author.username]),
+        )
+        for url in urls:
+            CacheViewTest.authorized_client.get(url)
+        Post.objects.create(
+            text='test-new-post',
+            group=CacheViewTest.group,
+            author=CacheViewTest.author,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = CacheViewTest.authorized_client.get(url)
+                self.assertContains(response, 'test-new-post')
+
+
+@override_settings(PAGE_CACHE_SECONDS=60, PAGE_CACHE_LOCK_WAIT=0.1)
+class PageCacheViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='page-author')
+        cls.group = Group.objects.create(title='Группа', slug='page-group')
+        cls.post = Post.objects.create(
+            text='page-post', group=cls.group, author=cls.author,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+
+    def lock(self, url):
+        _, lock = page_cache._key(RequestFactory().get(url))
+        cache.add(lock, True)
+
+    def test_anonymous_pages_are_cached_gzipped(self):
+        """Анонимы получают страницу из кэша, сжатую для gzip-клиентов"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.assertEqual(first[page_cache.HEADER], page_cache.MISS)
+                second = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+                self.assertEqual(second[page_cache.HEADER], page_cache.HIT)
+                self.assertEqual(second['Content-Encoding'], 'gzip')
+                self.assertEqual(
+                    gzip.decompress(second.content), first.content
+                )
+                plain = self.client.get(url)
+                self.assertEqual(plain.content, first.content)
+
+    def test_changes_invalidate_pages(self):
+        """Новый комментарий и новый пост сразу видны анонимам"""
+        for url in self.urls:
+            self.client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='page-comment',
+        )
+        Post.objects.create(
+            text='page-new-post', group=self.group, author=self.author,
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    response[page_cache.HEADER], page_cache.MISS
+                )
+        self.assertContains(response, 'page-comment')
+        self.assertContains(self.client.get(self.urls[0]), 'page-new-post')
+
+    def test_authorized_pages_are_not_cached(self):
+        """Страницы авторизованных пользователей не кэшируются"""
+        client = Client()
+        client.force_login(self.author)
+        client.get(self.urls[0])
+        response = client.get(self.urls[0])
+        self.assertFalse(response.has_header(page_cache.HEADER))
+
+    def test_stale_page_while_recomputing(self):
+        """Пока страницу пересчитывает другой запрос, отдаётся старая"""
+        url = self.urls[0]
+        self.client.get(url)
+        Post.objects.create(text='page-new-post', author=self.author)
+        self.lock(url)
+        response = self.client.get(url)
+        self.assertEqual(response[page_cache.HEADER], page_cache.STALE)
+        self.assertNotContains(response, 'page-new-post')
+
+    def test_waits_then_renders_without_copy(self):
+        """Без копии запрос ждёт пересчёта, а затем рендерит сам"""
+        url = self.urls[0]
+        self.lock(url)
+        response = self.client.get(url)
+        self.assertEqual(response[page_cache.HEADER], page_cache.MISS)
+        self.assertContains(response, 'page-post')
+        self.assertIsNone(cache.get(page_cache._key(response.wsgi_request)[0]))
+
+    def test_early_refresh(self):
+        """Запись с долгим рендерингом пересчитывается до истечения срока"""
+        entry = {'version': 'v', 'expires': time.time() + 1, 'delta': 0}
+        self.assertEqual(page_cache._state(entry, 'v'), page_cache.FRESH)
+        self.assertEqual(page_cache._state(entry, 'w'), page_cache.STALE)
+        entry['delta'] = 10 ** 9
+        self.assertEqual(page_cache._state(entry, 'v'), page_cache.EARLY)
+
+
+class ConditionalGetViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='etag-author')
+        cls.reader = User.objects.create_user(username='etag-reader')
+        cls.group = Group.objects.create(title='Группа', slug='etag-group')
+        cls.post = Post.objects.create(
+            text='etag-post', group=cls.group, author=cls.author,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_unchanged_pages_answer_304(self):
+        """Неизменившиеся ленты и пост отвечают 304 по ETag"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                etag = response['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='etag-comment',
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'etag-comment')
+
+    def test_etag_is_weak_and_varies_by_encoding(self):
+        """ETag слабый, ответ и 304 несут Vary: Accept-Encoding"""
+        url = reverse('posts:index')
+        for encoding in ('gzip', ''):
+            with self.subTest(encoding=encoding):
+                response = self.client.get(
+                    url, HTTP_ACCEPT_ENCODING=encoding
+                )
+                self.assertTrue(response['ETag'].startswith('W/"'))
+                self.assertIn('Accept-Encoding', response['Vary'])
+                response = self.client.get(
+                    url, HTTP_ACCEPT_ENCODING=encoding,
+                    HTTP_IF_NONE_MATCH=response['ETag'],
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_if_modified_since(self):
+        """Last-Modified принимается обратно в If-Modified-Since"""
+        url = reverse('posts:index')
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_depends_on_user_and_follows(self):
+        """ETag свой у каждого читателя и меняется с его подписками"""
+        url = reverse('posts:follow_index')
+        response = self.reader_client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertEqual(
+            self.reader_client.get(
+                url, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            HTTPStatus.NOT_MODIFIED,
+        )
+        author_client = Client()
+        author_client.force_login(self.author)
+        self.assertEqual(
+            author_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            HTTPStatus.OK,
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'etag-post')
+
+    def test_new_login_gets_fresh_form(self):
+        """После повторного входа страница с формой не отвечает 304"""
+        self.reader.set_password('etag-password')
+        self.reader.save()
+        credentials = {'username': 'etag-reader', 'password': 'etag-password'}
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        client = Client()
+        client.post(reverse('users:login'), credentials)
+        response = client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            HTTPStatus.NOT_MODIFIED,
+        )
+        client.get(reverse('users:logout'))
+        client.post(reverse('users:login'), credentials)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+@override_settings(PUBLIC_PAGES=True)
+class PublicPagesViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='public-author')
+        cls.reader = User.objects.create_user(username='public-reader')
+        cls.post = Post.objects.create(text='public-post', author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_pages_are_same_for_everyone(self):
+        """Ленты и пост одинаковы для всех и кэшируются прокси"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertEqual(
+                    response.content, self.client.get(url).content
+                )
+                self.assertNotContains(response, 'public-reader')
+                self.assertNotContains(response, 'csrfmiddlewaretoken')
+                self.assertContains(response, 'data-fragment="nav"')
+                self.assertIn('public', response['Cache-Control'])
+                self.assertNotIn('Cookie', response.get('Vary', ''))
+
+    def test_fragments_are_personal(self):
+        """Личные части страницы отдаются отдельно и не кэшируются"""
+        response = self.reader_client.get(reverse('posts:fragments'), {
+            'author': self.author.username, 'post': self.post.pk,
+        })
+        self.assertIn('no-store', response['Cache-Control'])
+        fragments = response.json()
+        self.assertIn('public-reader', fragments['nav'])
+        self.assertIn('Подписаться', fragments['follow'])
+        self.assertIn('csrfmiddlewaretoken', fragments['post'])
+        self.assertNotIn('Редактировать', fragments['post'])
+
+        anonymous = self.client.get(reverse('posts:fragments')).json()
+        self.assertEqual(set(anonymous), {'nav'})
+        self.assertIn('Войти', anonymous['nav'])
+
+
+class VersionBumpTest(TransactionTestCase):
+    def test_version_bumped_again_after_commit(self):
+        """Версия сдвигается и после фиксации транзакции записи"""
+        with transaction.atomic():
+            cache_versions.bump(cache_versions.FEED)
+            # Читатель до фиксации видит эту версию и старые строки.
+            seen = cache_versions.versions(cache_versions.FEED)
+        self.assertGreater(cache_versions.versions(cache_versions.FEED), seen)
+
+    def test_other_worker_bump_is_seen_at_once(self):
+        """Сдвиг версии другим воркером виден без задержки"""
+        [seen] = cache_versions.versions(cache_versions.FEED)
+        # Другой воркер пишет в общий кэш мимо локального уровня этого.
+        caches['shared'].set(
+            cache_versions._key(cache_versions.FEED), seen + 1, None
+        )
+        self.assertEqual(
+            cache_versions.versions(cache_versions.FEED), [seen + 1]
+        )
+
 
 class FollowViewTest(TestCase):
     @classmethod
@@ -579,3 +956,128 @@ class FollowViewTest(TestCase):
             follower,
             'Можно подписаться на самого себя'
         )
+
+
+class QueryBudgetViewTest(QueryBudgetMixin, TestCase):
+    # Сессия и пользователь, COUNT пагинатора, посты страницы и запросы
+    # самой страницы; от числа постов на странице бюджет не зависит.
+    FEED_BUDGET = 6
+    DETAIL_BUDGET = 4
+    # Индексный запрос за областями страницы для ETag (профиль и пост).
+    VALIDATOR_QUERIES = 1
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='test-reader')
+        cls.group = Group.objects.create(
+            title='test-group',
+            slug='test-slug',
+            description='test-description',
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'test-author-{index}')
+            for index in range(3)
+        ]
+        for index in range(15):
+            cls.post = Post.objects.create(
+                text=f'test-post-{index}',
+                author=cls.authors[index % 3],
+                group=cls.group,
+            )
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+            Comment.objects.create(
+                post=cls.post,
+                author=author,
+                text='test-comment',
+            )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(QueryBudgetViewTest.reader)
+
+    def test_listing_views_fit_query_budget(self):
+        """Ленты не делают N+1 запросов при любом размере страницы"""
+        urls = (
+            (reverse('posts:index'), self.FEED_BUDGET),
+            (
+                reverse('posts:group', args=[self.group.slug]),
+                self.FEED_BUDGET,
+            ),
+            (
+                reverse('posts:profile', args=[self.authors[0].username]),
+                self.FEED_BUDGET + self.VALIDATOR_QUERIES,
+            ),
+            (reverse('posts:follow_index'), self.FEED_BUDGET),
+        )
+        for page_size in (5, 15):
+            for url, budget in urls:
+                with self.subTest(url=url, page_size=page_size):
+                    cache.clear()
+                    with self.settings(AMOUNT=page_size):
+                        self.assertQueryBudget(
+                            self.reader_client, url, budget
+                        )
+
+    def test_post_detail_fits_query_budget(self):
+        """Страница поста не загружает авторов комментариев по одному"""
+        self.assertQueryBudget(
+            self.reader_client,
+            reverse('posts:post_detail', args=[self.post.id]),
+            self.DETAIL_BUDGET + self.VALIDATOR_QUERIES,
+        )
+
+
+@override_settings(WRITE_BATCHING=True)
+class WriteBatchingViewTest(TransactionTestCase):
+    def setUp(self):
+        self.addCleanup(write_queue.shutdown)
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(text='пост', author=self.author)
+        self.client.force_login(self.reader)
+
+    def test_comment_is_written_by_queue(self):
+        """Комментарий записывается очередью до ответа на запрос"""
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'комментарий'},
+        )
+        self.assertRedirects(
+            response, reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertTrue(
+            Comment.objects.filter(post=self.post, author=self.reader)
+            .exists()
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_comment_batch_updates_counter(self):
+        """Пачка комментариев пишется разом и обновляет счётчик поста"""
+        comments = [
+            Comment(post=self.post, author=self.reader, text=str(index))
+            for index in range(3)
+        ]
+        create_comments(comments)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+        self.assertEqual(self.post.comments.count(), 3)
+
+    def test_follow_and_unfollow_are_written_by_queue(self):
+        """Подписка и отписка записываются очередью со счётчиками"""
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1
+        )
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(Follow.objects.exists())
@@ -0,0 +1,123 @@
+"""
+Заблаговременная генерация миниатюр картинок постов.
+
+После сохранения поста с картинкой все размеры из THUMBNAIL_PRESETS
+строятся в пуле процессов, а шаблоны только ищут готовую миниатюру в
+хранилище sorl.thumbnail и до её появления показывают заглушку. Поток
+запроса картинку не декодирует.
+
+Режимы THUMBNAIL_PREGENERATE:
+    off   — как раньше: миниатюра строится при первом показе;
+    sync  — генерация сразу в текущем процессе (тесты, отладка);
+    async — генерация в пуле процессов после фиксации транзакции.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from core.pool import get_executor
+
+logger = logging.getLogger(__name__)
+
+OFF = 'off'
+SYNC = 'sync'
+ASYNC = 'async'
+
+
+def mode():
+    return settings.THUMBNAIL_PREGENERATE
+
+
+class LookupBackend(ThumbnailBackend):
+    """
+    Бэкенд sorl.thumbnail, который ищет миниатюру, но не строит её.
+
+    Готовность проверяется по файлу в хранилище, а не по kvstore: промах
+    kvstore кэшируется sorl надолго, и миниатюра, построенная другим
+    процессом, осталась бы невидимой.
+    """
+
+    def lookup(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        thumbnail = ImageFile(name, default.storage)
+        return thumbnail if thumbnail.exists() else None
+
+
+lookup_backend = LookupBackend()
+
+
+def ready_thumbnail(image, preset):
+    """Готовая миниатюра или None, пока она строится в фоне."""
+    if not image:
+        return None
+    geometry, options = settings.THUMBNAIL_PRESETS[preset]
+    if mode() == OFF:
+        return get_thumbnail(image, geometry, **options)
+    return lookup_backend.lookup(image, geometry, **options)
+
+
+def generate(name):
+    """Строит миниатюры всех размеров; выполняется в процессе пула."""
+    for geometry, options in settings.THUMBNAIL_PRESETS.values():
+        get_thumbnail(name, geometry, **options)
+    return name
+
+
+def mark_ready(post_id):
+    """Сбрасывает кэш карточки поста, чтобы заглушку сменила картинка."""
+    from . import cache_versions
+    from .models import Post
+
+    Post.objects.filter(pk=post_id).update(updated=timezone.now())
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'group_id'
+    ).first()
+    if post:
+        cache_versions.bump_post(post['author_id'], post['group_id'])
+
+
+def _on_done(post_id, submitter, future):
+    try:
+        future.result()
+        mark_ready(post_id)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры поста %s', post_id)
+    finally:
+        # Обычно колбэк выполняется в служебном потоке пула со своим
+        # соединением с БД; соединение потока запроса не трогаем.
+        if threading.get_ident() != submitter:
+            connection.close()
+
+
+def _submit(post_id, name):
+    future = get_executor().submit(generate, name)
+    submitter = threading.get_ident()
+    future.add_done_callback(lambda done: _on_done(post_id, submitter, done))
+
+
+def schedule(post):
+    """Ставит генерацию миниатюр картинки поста в очередь."""
+    if not post.image or mode() == OFF:
+        return
+    if mode() == SYNC:
+        generate(post.image.name)
+        return
+    name = post.image.name
+    transaction.on_commit(lambda: _submit(post.pk, name))
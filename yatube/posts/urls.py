@@ -17,6 +17,8 @@ urlpatterns = [
         views.add_comment, name='add_comment'
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('fragments/', views.fragments, name='fragments'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,8 +1,129 @@
+import base64
+import binascii
+import json
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'next'
+PREVIOUS = 'prev'
+
+
+def encode_token(payload):
+    """Упаковывает JSON-совместимые данные в непрозрачный токен для URL."""
+    raw = json.dumps(payload).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Распаковывает токен; для испорченного токена возвращает None."""
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode((token + padding).encode())
+        return json.loads(raw.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def encode_cursor(post, direction):
+    """Упаковывает позицию поста (pub_date, id) в непрозрачный токен."""
+    return encode_token([direction, post.pub_date.isoformat(), post.pk])
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор ленты; для испорченного курсора возвращает None."""
+    try:
+        direction, pub_date, pk = decode_token(cursor)
+        pub_date = parse_datetime(pub_date)
+    except (TypeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    if not isinstance(pk, int):
+        return None
+    return direction, pub_date, pk
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации: только «назад» и «вперёд»."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage of %s>' % len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset-пагинация по (pub_date, id).
+
+    Вместо COUNT(*) и OFFSET страница выбирается условием «строго раньше
+    (позже) курсора», поэтому глубокая страница стоит столько же, сколько
+    первая. Общее число страниц не известно, count и page_range не
+    используются шаблоном в этом режиме.
+    """
+    ordering = ('-pub_date', '-id')
+    reversed_ordering = ('pub_date', 'id')
+
+    def get_page(self, cursor):
+        position = decode_cursor(cursor) if cursor else None
+        if position is None:
+            return self._first_page()
+        direction, pub_date, pk = position
+        if direction == NEXT:
+            return self._page_after(pub_date, pk)
+        return self._page_before(pub_date, pk)
+
+    def _first_page(self):
+        rows = list(self.object_list.order_by(*self.ordering)[
+            :self.per_page + 1
+        ])
+        has_more = len(rows) > self.per_page
+        return self._build_page(rows[:self.per_page], has_more, False)
+
+    def _page_after(self, pub_date, pk):
+        rows = list(
+            self.object_list.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+            ).order_by(*self.ordering)[:self.per_page + 1]
+        )
+        has_more = len(rows) > self.per_page
+        return self._build_page(rows[:self.per_page], has_more, True)
+
+    def _page_before(self, pub_date, pk):
+        rows = list(
+            self.object_list.filter(
+                Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, id__gt=pk)
+            ).order_by(*self.reversed_ordering)[:self.per_page + 1]
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return self._build_page(rows, True, has_more)
+
+    def _build_page(self, rows, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(rows[-1], NEXT)
+        if rows and has_previous:
+            previous_cursor = encode_cursor(rows[0], PREVIOUS)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
 
 
-def create_paginator(obj_list, page):
+def create_paginator(obj_list, page, cursor=None):
+    if cursor is not None or settings.CURSOR_PAGINATION:
+        return CursorPaginator(obj_list, settings.AMOUNT).get_page(cursor)
     paginator = Paginator(obj_list, settings.AMOUNT)
     page_obj = paginator.get_page(page)
 
@@ -1,55 +1,133 @@
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.views.decorators.cache import never_cache
 
+from core import write_queue
+from core.conditional import conditional_page
+from core.page_cache import anonymous_page
+from core.public_pages import public_page
+
+from .cache_versions import (FEED, author_scope, follows_scope, group_scope,
+                             version_key)
+from .counters import user_stats
+from .entities import groups, users
+from .feed import follow_feed
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import count_elements, create_paginator
+from .models import Follow, Post
+from .search import search_posts
+from .utils import create_paginator
+from .writes import create_comments
+
+
+def _feed_version(request):
+    return version_key(FEED)
+
+
+def _group_version(request, slug):
+    group = groups.get(slug)
+    return version_key(group_scope(group and group.pk))
 
 
+def _author_version(request, username):
+    author = users.get(username)
+    author_id = author and author.pk
+    if request.user.is_authenticated:
+        # Кнопка «Подписаться» зависит от подписок читателя.
+        return version_key(
+            author_scope(author_id), follows_scope(request.user.pk)
+        )
+    return version_key(author_scope(author_id))
+
+
+def _post_version(request, post_id):
+    # Пост, его комментарии и подпись автора сдвигают версию автора,
+    # название группы — версию группы.
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'group_id'
+    ).first() or {}
+    return version_key(
+        author_scope(post.get('author_id')),
+        group_scope(post.get('group_id')),
+    )
+
+
+def _follow_version(request):
+    return version_key(FEED, follows_scope(request.user.pk))
+
+
+@public_page
+@conditional_page(_feed_version)
+@anonymous_page(_feed_version)
 def index(request):
-    post_list = Post.objects.select_related('group').all()
-    page_obj = create_paginator(post_list, request.GET.get('page'))
+    post_list = Post.objects.for_feed()
+    page_obj = create_paginator(
+        post_list,
+        request.GET.get('page'),
+        request.GET.get('cursor'),
+    )
     context = {
         'page_obj': page_obj,
+        'cache_version': version_key(FEED),
     }
     return render(request, 'posts/index.html', context)
 
 
+@public_page
+@conditional_page(_group_version)
+@anonymous_page(_group_version)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = create_paginator(post_list, request.GET.get('page'))
+    group = groups.get_or_404(slug)
+    post_list = group.posts.for_feed()
+    page_obj = create_paginator(
+        post_list,
+        request.GET.get('page'),
+        request.GET.get('cursor'),
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
+        'cache_version': version_key(group_scope(group.pk)),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@public_page
+@conditional_page(_author_version)
+@anonymous_page(_author_version)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = users.get_or_404(username)
     following = request.user.is_authenticated and (
         Follow.objects.filter(
             user=request.user,
             author=author,
         ).exists()
     )
-    author_posts = author.posts.all()
-    page_obj = create_paginator(author_posts, request.GET.get('page'))
-    posts_count = count_elements(author_posts)
+    author_posts = author.posts.for_feed()
+    page_obj = create_paginator(
+        author_posts,
+        request.GET.get('page'),
+        request.GET.get('cursor'),
+    )
+    posts_count = user_stats(author).posts_count
     context = {
         'author': author,
         'page_obj': page_obj,
         'posts_count': posts_count,
         'following': following,
+        'cache_version': version_key(author_scope(author.pk)),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@public_page
+@conditional_page(_post_version)
+@anonymous_page(_post_version)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    posts = Post.objects.filter(author__exact=post.author).count()
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.for_detail(), id=post_id)
+    posts = user_stats(post.author).posts_count
+    comments = post.comments.select_related('author').order_by('created')
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
@@ -60,6 +138,46 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@never_cache
+def fragments(request):
+    """Личные части публичных страниц: меню, подписка, форма комментария."""
+    rendered = {
+        'nav': render_to_string('includes/header_user.html', {}, request),
+    }
+    username = request.GET.get('author')
+    if username:
+        author = users.get_or_404(username)
+        following = request.user.is_authenticated and (
+            Follow.objects.filter(user=request.user, author=author).exists()
+        )
+        rendered['follow'] = render_to_string(
+            'posts/includes/follow_button.html',
+            {'author': author, 'following': following},
+            request,
+        )
+    post_id = request.GET.get('post', '')
+    if post_id.isdigit():
+        post = get_object_or_404(
+            Post.objects.select_related('author'), pk=post_id
+        )
+        rendered['post'] = render_to_string(
+            'posts/includes/post_actions.html',
+            {'post': post, 'form': CommentForm()},
+            request,
+        )
+    return JsonResponse(rendered)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search_posts(query, request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -68,7 +186,7 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        write_queue.submit_many(create_comments, comment)
         return redirect(
             'posts:post_detail',
             post_id=post.id,
@@ -122,30 +240,34 @@ def post_edit(request, post_id):
 
 
 @login_required
+@conditional_page(_follow_version)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = create_paginator(posts, request.GET.get('page'))
+    posts = follow_feed(request.user).for_feed()
+    page_obj = create_paginator(
+        posts,
+        request.GET.get('page'),
+        request.GET.get('cursor'),
+    )
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'cache_version': _follow_version(request),
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = users.get_or_404(username)
     if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author,
-                                     defaults={
-                                         'user': request.user,
-                                         'author': author
-                                     })
+        write_queue.submit(
+            Follow.objects.get_or_create, user=request.user, author=author,
+        )
     return redirect('posts:profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = users.get_or_404(username)
     follow_object = get_object_or_404(Follow, user=request.user, author=author)
-    follow_object.delete()
+    write_queue.submit(follow_object.delete)
     return redirect('posts:profile', username)
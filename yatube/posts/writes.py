@@ -0,0 +1,22 @@
+"""Записи, которые очередь групповой фиксации выполняет пачками."""
+from collections import Counter
+
+from .models import Comment
+from .signals import comments_changed
+
+
+def create_comments(comments):
+    """
+    Сохраняет комментарии. Одиночный комментарий сохраняется как обычно,
+    пачка — одним INSERT и одним обновлением счётчика на пост: сигналы
+    bulk_create не вызывает, поэтому их работа повторена здесь.
+    """
+    if len(comments) == 1:
+        comments[0].save()
+        return comments
+    Comment.objects.bulk_create(comments)
+    for post_id, count in Counter(
+        comment.post_id for comment in comments
+    ).items():
+        comments_changed(post_id, count)
+    return comments
@@ -0,0 +1,8 @@
+import os
+
+
+def settings_module():
+    """Модуль настроек по окружению: YATUBE_ENV=production — боевые."""
+    if os.getenv('YATUBE_ENV') == 'production':
+        return 'yatube.settings_production'
+    return 'yatube.settings'
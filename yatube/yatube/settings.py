@@ -1,4 +1,5 @@
 import os
+from importlib.util import find_spec
 
 from django.urls import reverse_lazy
 
@@ -7,7 +8,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 SECRET_KEY = '&9#37q#&--l1pe^2z)#+3(ty9_q(e!k8!h0$8a2rk8p_eeuk27'
 
-DEBUG = True
+DEBUG = os.getenv('YATUBE_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -34,10 +35,12 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,36 +48,54 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
-ROOT_URLCONF = 'yatube.urls'
+# debug_toolbar подключается только в отладке и только если установлен.
+DEBUG_TOOLBAR = DEBUG and find_spec('debug_toolbar') is not None
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
 
-TEMPLATES = [
-    {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
-        'APP_DIRS': True,
-        'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.debug',
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
-        },
-    },
-]
+ROOT_URLCONF = 'yatube.urls'
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite с WAL, mmap и BEGIN IMMEDIATE для нескольких воркеров.
+        'ENGINE': os.getenv('YATUBE_DB_ENGINE', 'core.backends.sqlite3'),
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт CONN_MAX_AGE секунд между запросами; перед
+        # запросом живое соединение проверяется (core.db).
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_CONN_MAX_AGE', '0')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
+# Реплики для чтения: пути к копиям базы SQLite через запятую. Копии
+# обновляет команда sync_replicas; в тестах реплики зеркалят default.
+DATABASE_REPLICAS = []
+for index, path in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{index}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Страницы, которые читают с реплик, и сколько секунд после записи
+# пользователь читает с основной базы.
+REPLICA_VIEWS = {
+    'posts:home',
+    'posts:index',
+    'posts:group',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+}
+REPLICA_STICKY_SECONDS = int(os.getenv('YATUBE_REPLICA_STICKY_SECONDS', '5'))
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -113,7 +134,8 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.InstrumentedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -123,12 +145,100 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.public_page.public_page',
             ],
         },
     },
 ]
 
 AMOUNT = 10
+# Группы по slug и авторы по username из кэша; отсутствие — недолго.
+ENTITY_CACHE_SECONDS = 3600
+ENTITY_CACHE_MISSING_SECONDS = 60
+# Курсорная пагинация лент по (pub_date, id) вместо номеров страниц.
+CURSOR_PAGINATION = os.getenv('YATUBE_CURSOR_PAGINATION', '') == '1'
+# Материализованная лента подписок (fan-out on write).
+FEED_FANOUT = os.getenv('YATUBE_FEED_FANOUT', '') == '1'
+FEED_TIMELINE_SIZE = 1000
+# Авторы с большим числом подписчиков подмешиваются в ленту при чтении.
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+# Карточки постов кэшируются по (id, updated) и живут сутки.
+POST_CARD_CACHE_TTL = 60 * 60 * 24
+# Поиск: fts5 (SQLite), inverted (таблица SearchTerm) или auto.
+SEARCH_BACKEND = os.getenv('YATUBE_SEARCH_BACKEND', 'auto')
+# Процессы пула для работы с картинками (миниатюры, перекодирование).
+IMAGE_WORKERS = int(os.getenv('YATUBE_IMAGE_WORKERS', '2'))
+# Миниатюры строятся заранее: off (при показе), sync или async (пул).
+THUMBNAIL_PREGENERATE = os.getenv('YATUBE_THUMBNAIL_PREGENERATE', 'async')
+THUMBNAIL_PRESETS = {
+    'feed': ('960x339', {'crop': 'center', 'upscale': True}),
+    'detail': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Загрузки пишутся на диск кусками, сверх лимита данные отбрасываются.
+FILE_UPLOAD_HANDLERS = ['core.uploads.LimitedTemporaryFileUploadHandler']
+FILE_UPLOAD_MAX_SIZE = int(
+    os.getenv('YATUBE_FILE_UPLOAD_MAX_SIZE', str(10 * 2 ** 20))
+)
+IMAGE_MAX_SIDE = 8000
+IMAGE_MAX_PIXELS = 40_000_000
+# Перекодирование картинок без метаданных: off, inline или pool.
+IMAGE_REENCODE = os.getenv('YATUBE_IMAGE_REENCODE', 'pool')
+IMAGE_REENCODE_TIMEOUT = 30
+# /metrics/ доступен персоналу и сборщику метрик с заголовком
+# Authorization: Bearer <YATUBE_METRICS_TOKEN>. Список адресов без входа
+# по умолчанию пуст: за обратным прокси все запросы приходят с 127.0.0.1.
+METRICS_TOKEN = os.getenv('YATUBE_METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [
+    address for address
+    in os.getenv('YATUBE_METRICS_ALLOWED_IPS', '').split(',') if address
+]
+# Профилируется в среднем каждый N-й запрос (0 — только по заголовку
+# X-Yatube-Profile, который печатает perf_report --token).
+PROFILE_SAMPLE_RATE = int(os.getenv('YATUBE_PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = os.getenv(
+    'YATUBE_PROFILE_DIR', os.path.join(BASE_DIR, 'profiles')
+)
+PROFILE_KEEP = 200
+PROFILE_TOKEN_AGE = 60 * 60
+# Запросы к БД дольше SLOW_QUERY_MS пишутся в журнал; пустое значение
+# отключает журнал.
+SLOW_QUERY_MS = (
+    float(os.getenv('YATUBE_SLOW_QUERY_MS', '100'))
+    if os.getenv('YATUBE_SLOW_QUERY_MS', '100') else None
+)
+SLOW_QUERY_LOG = os.getenv(
+    'YATUBE_SLOW_QUERY_LOG', os.path.join(BASE_DIR, 'slow_queries.log')
+)
+# Комментарии и подписки пишутся пачками одним потоком-писателем:
+# до WRITE_BATCH_SIZE операций или WRITE_BATCH_WAIT_MS миллисекунд.
+WRITE_BATCHING = os.getenv('YATUBE_WRITE_BATCHING', '') == '1'
+WRITE_BATCH_SIZE = int(os.getenv('YATUBE_WRITE_BATCH_SIZE', '100'))
+WRITE_BATCH_WAIT_MS = float(os.getenv('YATUBE_WRITE_BATCH_WAIT_MS', '5'))
+WRITE_BATCH_TIMEOUT = 30
+# Ленты и посты для анонимных посетителей кэшируются целиком на
+# PAGE_CACHE_SECONDS секунд (0 — выключено, боевые настройки включают) и
+# ещё PAGE_CACHE_STALE_SECONDS секунд отдаются устаревшими, пока страницу
+# пересчитывает один запрос.
+PAGE_CACHE_SECONDS = int(os.getenv('YATUBE_PAGE_CACHE_SECONDS', '0'))
+PAGE_CACHE_STALE_SECONDS = int(
+    os.getenv('YATUBE_PAGE_CACHE_STALE_SECONDS', '300')
+)
+PAGE_CACHE_LOCK_SECONDS = 10
+PAGE_CACHE_LOCK_WAIT = 2
+# Чем больше, тем раньше страница пересчитывается до истечения срока.
+PAGE_CACHE_BETA = 1.0
+# Ленты и посты без личных частей, с Cache-Control: public для прокси и
+# CDN (s-maxage); личное догружается с posts:fragments.
+PUBLIC_PAGES = os.getenv('YATUBE_PUBLIC_PAGES', '') == '1'
+PUBLIC_PAGES_MAX_AGE = int(os.getenv('YATUBE_PUBLIC_PAGES_MAX_AGE', '60'))
+# Сессии и пользователь запроса читаются из кэша (0 запросов к БД на
+# авторизацию); изменения сессии пишутся в БД в фоне. Кэш — общий уровень
+# без локального: выход и смена пароля сразу видны всем воркерам.
+SESSION_ENGINE = 'core.sessions'
+SESSION_CACHE_ALIAS = 'shared'
+AUTHENTICATION_BACKENDS = ['core.auth.CachedModelBackend']
+USER_CACHE_SECONDS = 3600
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 LOGOUT_URL = reverse_lazy('logout')
@@ -137,8 +247,50 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Общий кэш выбирается окружением: locmem (по умолчанию, на процесс),
+# file или db (общие для процессов без внешних сервисов) или memcached
+# (нужен python-memcached). Для db таблицу создаёт команда
+# python manage.py createcachetable.
+SHARED_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+}
+SHARED_CACHE_LOCATIONS = {
+    'locmem': 'yatube',
+    'file': os.path.join(BASE_DIR, 'cache'),
+    'db': 'yatube_cache',
+    'memcached': '127.0.0.1:11211',
+}
+SHARED_CACHE = os.getenv('YATUBE_CACHE_BACKEND', 'locmem')
+
 CACHES = {
+    # Локальный LRU процесса перед общим уровнем, со счётчиками попаданий.
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'LOCAL_MAX_ENTRIES': int(
+                os.getenv('YATUBE_CACHE_LOCAL_ENTRIES', '1000')
+            ),
+            'LOCAL_TIMEOUT': float(
+                os.getenv('YATUBE_CACHE_LOCAL_TIMEOUT', '5')
+            ),
+        },
+    },
+    'shared': {
+        'BACKEND': SHARED_CACHE_BACKENDS[SHARED_CACHE],
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_LOCATION',
+            SHARED_CACHE_LOCATIONS[SHARED_CACHE],
+        ),
+        'TIMEOUT': None,
+        # Клиент memcached принимает OPTIONS как аргументы и не знает
+        # MAX_ENTRIES.
+        'OPTIONS': (
+            {} if SHARED_CACHE == 'memcached' else {'MAX_ENTRIES': 100000}
+        ),
+    },
 }
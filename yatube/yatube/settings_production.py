@@ -0,0 +1,75 @@
+"""
+Боевые настройки: выбираются переменной окружения YATUBE_ENV=production.
+
+Без отладки и debug_toolbar, с кэшем скомпилированных шаблонов,
+постоянными соединениями с БД и кэшем страниц для анонимных посетителей.
+perf_check сообщает, если что-то из этого выключено. Общий кэш по
+умолчанию файловый, чтобы сессии были видны всем воркерам.
+"""
+import os
+
+from yatube.settings import *  # noqa: F401,F403
+from yatube.settings import (
+    CACHES, DATABASES, INSTALLED_APPS, MIDDLEWARE, SHARED_CACHE_BACKENDS,
+    SHARED_CACHE_LOCATIONS, TEMPLATES,
+)
+
+DEBUG = False
+
+SECRET_KEY = os.getenv('YATUBE_SECRET_KEY', SECRET_KEY)  # noqa: F405
+
+ALLOWED_HOSTS = os.getenv(
+    'YATUBE_ALLOWED_HOSTS', ','.join(ALLOWED_HOSTS)  # noqa: F405
+).split(',')
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if not middleware.startswith('debug_toolbar')
+]
+DEBUG_TOOLBAR = False
+
+# Шаблоны компилируются один раз на процесс.
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'context_processors': [
+            processor
+            for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+            if processor != 'django.template.context_processors.debug'
+        ],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+DATABASES = {
+    alias: {
+        **database,
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+    }
+    for alias, database in DATABASES.items()
+}
+
+PAGE_CACHE_SECONDS = int(os.getenv('YATUBE_PAGE_CACHE_SECONDS', '60'))
+
+# Сессии и снимки пользователей должны быть общими для всех воркеров:
+# locmem у каждого процесса свой.
+if 'YATUBE_CACHE_BACKEND' not in os.environ:
+    CACHES = {
+        **CACHES,
+        'shared': {
+            **CACHES['shared'],
+            'BACKEND': SHARED_CACHE_BACKENDS['file'],
+            'LOCATION': os.getenv(
+                'YATUBE_CACHE_LOCATION', SHARED_CACHE_LOCATIONS['file']
+            ),
+        },
+    }